@@ -1,5 +1,5 @@
 # app/app_server.py
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flasgger import Swagger
 import time
 import json
@@ -7,6 +7,9 @@ import os
 import sys
 import random
 
+from app.concurrency import InFlightTracker
+from app.responses import build_response_bodies
+
 # ----------------------
 # 讀取設定檔
 # ----------------------
@@ -19,6 +22,28 @@ else:
     print("無法啟動伺服器：缺少設定檔 config/server_config.json")
     sys.exit(1)
 
+# 各 API 的模擬處理時間（秒）
+DELAYS = {
+    "landing_page": 0.5,
+    "start_form": 0.2,
+    "submit_form": 0.3,
+    **CONFIG.get("delays", {})
+}
+ROUTES = list(DELAYS)
+
+# 成功率 / 延遲模型使用的併發量來源
+#   client：客戶端在 submit_form 傳入的 current_users（原本行為）
+#   measured：伺服器實際量測的處理中請求數
+CONCURRENCY_SOURCE = CONFIG.get("concurrency_source", "client")
+# 併發達 decay_end 時處理時間額外放大的倍數，0 表示固定延遲
+LATENCY_SCALE = CONFIG.get("latency_scale", 0.0)
+
+tracker = InFlightTracker(ROUTES, window=CONFIG.get("arrival_window", 10))
+
+# 回應內容大小設定，payload_profiles 中可定義多組，例如 100 KB / 5 MB 的媒體預覽
+PAYLOAD_PROFILE = CONFIG.get("payload_profile", "default")
+BODIES = build_response_bodies(CONFIG.get("payload_profiles", {}).get(PAYLOAD_PROFILE, {}))
+
 # ----------------------
 # 初始化 Flask
 # ----------------------
@@ -46,6 +71,39 @@ def get_success_probability(current_users):
     success_prob = max(min(success_prob, base), min_rate)
     return success_prob
 
+# ----------------------
+# 併發量與延遲模型
+# ----------------------
+def observed_users(client_users=None):
+    """依 CONCURRENCY_SOURCE 回傳模型使用的併發量，client 模式下沒有傳入值時為 None"""
+    if CONCURRENCY_SOURCE == "measured":
+        return tracker.current()
+    return client_users
+
+
+def get_delay(route, current_users=None):
+    """處理時間：基本延遲依負載在 safe ~ decay_end 之間線性放大"""
+    base = DELAYS[route]
+    if current_users is None or not LATENCY_SCALE:
+        return base
+    t = CONFIG["user_thresholds"]
+    ratio = (current_users - t["safe"]) / (t["decay_end"] - t["safe"])
+    return base * (1 + LATENCY_SCALE * max(0.0, min(ratio, 1.0)))
+
+# ----------------------
+# 追蹤處理中請求
+# ----------------------
+@app.before_request
+def track_enter():
+    if request.endpoint in ROUTES:
+        tracker.enter(request.endpoint)
+
+
+@app.teardown_request
+def track_exit(exc):
+    if request.endpoint in ROUTES:
+        tracker.exit(request.endpoint)
+
 # ----------------------
 # GET /landing_page
 # ----------------------
@@ -63,12 +121,8 @@ def landing_page():
               message: "歡迎來到匿名表單填寫系統！"
               media_preview: "模擬圖片/影片大字串...(略)"
     """
-    time.sleep(0.5)
-    media_preview = "X" * 100000
-    return jsonify({
-        "message": "歡迎來到匿名表單填寫系統！",
-        "media_preview": media_preview[:100] + "...(略)"
-    })
+    time.sleep(get_delay("landing_page", observed_users()))
+    return Response(BODIES["landing_page"], mimetype="application/json")
 
 # ----------------------
 # GET /start_form
@@ -93,18 +147,8 @@ def start_form():
                   receive_promotions: false
                   receive_birthday_notifications: false
     """
-    time.sleep(0.2)
-    form_structure = {
-        "gender": "",
-        "age_group": "",
-        "feedback": "",
-        "willing": {
-            "to_return": False,
-            "receive_promotions": False,
-            "receive_birthday_notifications": False
-        }
-    }
-    return jsonify({"form": form_structure})
+    time.sleep(get_delay("start_form", observed_users()))
+    return Response(BODIES["start_form"], mimetype="application/json")
 
 # ----------------------
 # POST /submit_form
@@ -154,12 +198,14 @@ def submit_form():
         description: 伺服器忙碌
     """
     form_data = request.json or {}
-    current_users = form_data.get("current_users", CONFIG["user_thresholds"]["safe"])
+    current_users = observed_users(form_data.get("current_users", CONFIG["user_thresholds"]["safe"]))
     success_prob = get_success_probability(current_users)
-    time.sleep(0.3)
+    time.sleep(get_delay("submit_form", current_users))
 
     # 依成功率決定回傳
-    if random.random() < success_prob:
+    success = random.random() < success_prob
+    tracker.record_outcome(success)
+    if success:
         return jsonify({
             "message": f"表單提交成功！（目前模擬使用者 {current_users} 人，成功率 {success_prob:.2f}）",
             "received_form": form_data
@@ -169,6 +215,39 @@ def submit_form():
             "message": f"伺服器忙碌，請稍後再試。（目前模擬使用者 {current_users} 人，成功率 {success_prob:.2f}）"
         }), 503
 
+# ----------------------
+# GET /metrics
+# ----------------------
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    伺服器端實際量測的併發量
+    ---
+    responses:
+      200:
+        description: 各路由處理中請求數與到達速率
+        content:
+          application/json:
+            example:
+              concurrency_source: "measured"
+              in_flight:
+                landing_page: 120
+                start_form: 40
+                submit_form: 60
+              total_in_flight: 220
+              peak_in_flight: 250
+              requests:
+                landing_page: 5000
+                start_form: 4900
+                submit_form: 4850
+              success: 4500
+              failure: 350
+              arrival_rate: 480.5
+              window: 10
+              workers: 1
+    """
+    return jsonify({"concurrency_source": CONCURRENCY_SOURCE, **tracker.snapshot()})
+
 if __name__ == "__main__":
     # 啟動多線程模式，方便高併發測試
-    app.run(debug=True, threaded=True)
+    app.run(debug=True, threaded=True, port=CONFIG.get("port", 5000))
@@ -0,0 +1,83 @@
+# app/async_server.py
+import asyncio
+import random
+
+from aiohttp import web
+
+# 沿用 Flask 版的設定與成功率模型，Swagger 文件仍由 app_server 提供
+from app.app_server import (
+    CONFIG, CONCURRENCY_SOURCE, ROUTES, BODIES, tracker, get_success_probability, observed_users, get_delay
+)
+from utils.system import raise_fd_limit
+
+# ----------------------
+# 追蹤處理中請求
+# ----------------------
+@web.middleware
+async def track_in_flight(request, handler):
+    route = request.match_info.route.name
+    if route in ROUTES:
+        with tracker.track(route):
+            return await handler(request)
+    return await handler(request)
+
+# ----------------------
+# GET /landing_page
+# ----------------------
+async def landing_page(request):
+    await asyncio.sleep(get_delay("landing_page", observed_users()))
+    return web.Response(body=BODIES["landing_page"], content_type="application/json")
+
+# ----------------------
+# GET /start_form
+# ----------------------
+async def start_form(request):
+    await asyncio.sleep(get_delay("start_form", observed_users()))
+    return web.Response(body=BODIES["start_form"], content_type="application/json")
+
+# ----------------------
+# POST /submit_form
+# ----------------------
+async def submit_form(request):
+    try:
+        form_data = await request.json() or {}
+    except ValueError:
+        form_data = {}
+    current_users = observed_users(form_data.get("current_users", CONFIG["user_thresholds"]["safe"]))
+    success_prob = get_success_probability(current_users)
+    await asyncio.sleep(get_delay("submit_form", current_users))
+
+    # 依成功率決定回傳
+    success = random.random() < success_prob
+    tracker.record_outcome(success)
+    if success:
+        return web.json_response({
+            "message": f"表單提交成功！（目前模擬使用者 {current_users} 人，成功率 {success_prob:.2f}）",
+            "received_form": form_data
+        })
+    else:
+        return web.json_response({
+            "message": f"伺服器忙碌，請稍後再試。（目前模擬使用者 {current_users} 人，成功率 {success_prob:.2f}）"
+        }, status=503)
+
+
+# ----------------------
+# GET /metrics
+# ----------------------
+async def metrics(request):
+    return web.json_response({"concurrency_source": CONCURRENCY_SOURCE, **tracker.snapshot()})
+
+
+def create_app():
+    async_app = web.Application(middlewares=[track_in_flight])
+    async_app.router.add_get("/landing_page", landing_page, name="landing_page")
+    async_app.router.add_get("/start_form", start_form, name="start_form")
+    async_app.router.add_post("/submit_form", submit_form, name="submit_form")
+    async_app.router.add_get("/metrics", metrics)
+    return async_app
+
+
+if __name__ == "__main__":
+    # 單核心上萬連線：提高檔案描述符上限、加大 backlog、關閉 access log
+    raise_fd_limit()
+    web.run_app(create_app(), host="127.0.0.1", port=CONFIG.get("port", 5000), backlog=16384, access_log=None)
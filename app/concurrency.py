@@ -0,0 +1,125 @@
+# app/concurrency.py
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+
+
+# ----------------------
+# 伺服器端實際併發量
+# ----------------------
+class InFlightTracker:
+    """
+    追蹤每個路由目前處理中的請求數、成功 / 失敗次數與滑動視窗內的到達速率。
+
+    計數存放在一塊扁平的 int64 緩衝區，每個 worker 一段（block），只寫自己的 block，
+    讀取時加總所有 worker，因此 prefork 模式下改指向共享記憶體即可得到全域數值。
+    每次進出只在一把極短的鎖內做幾個整數加減；async 伺服器只有單一線程，鎖不會競爭。
+    """
+
+    def __init__(self, routes, window=10):
+        self.routes = list(routes)
+        self.window = window
+        self._route_index = {route: i for i, route in enumerate(self.routes)}
+        self._lock = threading.Lock()
+
+        # block 配置：in_flight[R] | requests[R] | success | failure | peak | ready | ring_sec[W] | ring_count[W]
+        r = len(self.routes)
+        self._requests_at = r
+        self._success_at = 2 * r
+        self._failure_at = 2 * r + 1
+        self._peak_at = 2 * r + 2
+        self._ready_at = 2 * r + 3
+        self._ring_sec_at = 2 * r + 4
+        self._ring_count_at = 2 * r + 4 + window
+        self.block_size = 2 * r + 4 + 2 * window
+
+        self.num_workers = 1
+        self._base = 0
+        self._counts = memoryview(array("q", [0]) * self.block_size)
+        # 單一程序能回應 /metrics 即已就緒；共享記憶體中的 worker 由 mark_ready() 自行標記
+        self._counts[self._ready_at] = 1
+
+    def use_shared(self, buffer, num_workers, worker_id):
+        """
+        改用共享記憶體（例如 multiprocessing.RawArray("q", block_size * num_workers)），
+        本程序只寫第 worker_id 段。
+        """
+        self._counts = memoryview(buffer).cast("B").cast("q")
+        self.num_workers = num_workers
+        self._base = worker_id * self.block_size
+
+    # ---- 寫入端（只寫本 worker 的 block） ----
+    def mark_ready(self):
+        """本 worker 的 socket 已開始 listen，可以接受連線"""
+        self._counts[self._base + self._ready_at] = 1
+
+    def enter(self, route):
+        i = self._route_index[route]
+        c, base = self._counts, self._base
+        sec = int(time.monotonic())
+        slot = sec % self.window
+        with self._lock:
+            c[base + i] += 1
+            c[base + self._requests_at + i] += 1
+            total = self.current()
+            if total > c[base + self._peak_at]:
+                c[base + self._peak_at] = total
+            if c[base + self._ring_sec_at + slot] != sec:
+                c[base + self._ring_sec_at + slot] = sec
+                c[base + self._ring_count_at + slot] = 0
+            c[base + self._ring_count_at + slot] += 1
+
+    def exit(self, route):
+        i = self._route_index[route]
+        with self._lock:
+            self._counts[self._base + i] -= 1
+
+    @contextmanager
+    def track(self, route):
+        self.enter(route)
+        try:
+            yield
+        finally:
+            self.exit(route)
+
+    def record_outcome(self, success):
+        offset = self._success_at if success else self._failure_at
+        with self._lock:
+            self._counts[self._base + offset] += 1
+
+    # ---- 讀取端（加總所有 worker） ----
+    def _sum(self, offset):
+        c, size = self._counts, self.block_size
+        return sum(c[w * size + offset] for w in range(self.num_workers))
+
+    def current(self):
+        """目前所有路由處理中的請求總數，每位用戶同時最多一個請求，可視為實際併發用戶數"""
+        return sum(self._sum(i) for i in range(len(self.routes)))
+
+    def arrival_rate(self):
+        """最近 window 秒（不含當前這一秒）的平均每秒到達數"""
+        now_sec = int(time.monotonic())
+        c, size = self._counts, self.block_size
+        arrivals = 0
+        for w in range(self.num_workers):
+            base = w * size
+            for slot in range(self.window):
+                if now_sec - self.window <= c[base + self._ring_sec_at + slot] < now_sec:
+                    arrivals += c[base + self._ring_count_at + slot]
+        return arrivals / self.window
+
+    def snapshot(self):
+        c, size = self._counts, self.block_size
+        return {
+            "in_flight": {route: self._sum(i) for i, route in enumerate(self.routes)},
+            "total_in_flight": self.current(),
+            "peak_in_flight": max(c[w * size + self._peak_at] for w in range(self.num_workers)),
+            "requests": {route: self._sum(self._requests_at + i) for i, route in enumerate(self.routes)},
+            "success": self._sum(self._success_at),
+            "failure": self._sum(self._failure_at),
+            "arrival_rate": self.arrival_rate(),
+            "window": self.window,
+            "workers": self.num_workers,
+            "workers_ready": self._sum(self._ready_at)
+        }
@@ -0,0 +1,80 @@
+# app/prefork_server.py
+import argparse
+import asyncio
+import multiprocessing
+import signal
+
+from aiohttp import web
+
+from app.app_server import CONFIG, DELAYS, tracker
+from app.async_server import create_app
+from utils.system import raise_fd_limit
+
+
+# ----------------------
+# Worker
+# ----------------------
+async def serve(port):
+    runner = web.AppRunner(create_app(), access_log=None)
+    await runner.setup()
+    # 每個 worker 各自 bind 同一個 port（SO_REUSEPORT），由 kernel 分配連線
+    site = web.TCPSite(runner, "127.0.0.1", port, reuse_port=True, backlog=16384)
+    await site.start()
+    # socket 已在 listen 才標記就緒，benchmark 依各 worker 的就緒旗標判斷何時開始量測
+    tracker.mark_ready()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    await runner.cleanup()
+
+
+def worker_main(worker_id, num_workers, shared, port):
+    # 併發計數改指向共享記憶體，成功率模型看到的是所有 worker 的總和
+    tracker.use_shared(shared, num_workers, worker_id)
+    raise_fd_limit()
+    asyncio.run(serve(port))
+
+
+# ----------------------
+# 主程序
+# ----------------------
+def run_prefork(num_workers, port):
+    """
+    啟動 num_workers 個 async 伺服器程序共用同一個 port，
+    計數器放在共享記憶體中，每個 worker 只寫自己的區段。
+    """
+    ctx = multiprocessing.get_context("fork")
+    shared = ctx.RawArray("q", tracker.block_size * num_workers)
+    procs = [
+        ctx.Process(target=worker_main, args=(i, num_workers, shared, port), name=f"server-worker-{i}")
+        for i in range(num_workers)
+    ]
+    for p in procs:
+        p.start()
+    print(f"Prefork server: {num_workers} workers on http://127.0.0.1:{port}")
+
+    def stop(signum, frame):
+        for p in procs:
+            p.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for p in procs:
+        p.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prefork async API server")
+    parser.add_argument("--workers", type=int, default=CONFIG.get("workers", multiprocessing.cpu_count()),
+                        help="Number of worker processes")
+    parser.add_argument("--port", type=int, default=CONFIG.get("port", 5000), help="Listening port")
+    parser.add_argument("--no_delay", action="store_true",
+                        help="Disable simulated delays (for raw throughput benchmarks)")
+    args = parser.parse_args()
+
+    if args.no_delay:
+        DELAYS.update({route: 0.0 for route in DELAYS})
+    run_prefork(args.workers, args.port)
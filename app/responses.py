@@ -0,0 +1,50 @@
+# app/responses.py
+import json
+
+# ----------------------
+# 固定回應內容
+# ----------------------
+LANDING_MESSAGE = "歡迎來到匿名表單填寫系統！"
+
+EMPTY_FORM = {
+    "gender": "",
+    "age_group": "",
+    "feedback": "",
+    "willing": {
+        "to_return": False,
+        "receive_promotions": False,
+        "receive_birthday_notifications": False
+    }
+}
+
+
+def landing_page_payload(media_preview_bytes=0):
+    """
+    media_preview_bytes 為 0 時回傳原本截斷的預覽字串，
+    否則附上完整大小的模擬媒體，用來單獨壓測頻寬。
+    """
+    if media_preview_bytes:
+        media_preview = "X" * media_preview_bytes
+    else:
+        media_preview = "X" * 100 + "...(略)"
+    return {"message": LANDING_MESSAGE, "media_preview": media_preview}
+
+
+# ----------------------
+# 預先編碼的回應
+# ----------------------
+def build_response_bodies(profile):
+    """
+    啟動時將固定內容的路由回應一次編碼成 bytes，每個請求直接送出同一份 bytes，
+    不再重新產生字串或經過 jsonify。
+
+    Args:
+        profile (dict): payload profile，例如 {"media_preview_bytes": 5000000}。
+
+    Returns:
+        dict: 路由名稱 -> 回應 body (bytes)。
+    """
+    return {
+        "landing_page": json.dumps(landing_page_payload(profile.get("media_preview_bytes", 0))).encode("utf-8"),
+        "start_form": json.dumps({"form": EMPTY_FORM}).encode("utf-8")
+    }
@@ -0,0 +1,238 @@
+# benchmark/client_overhead.py
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+RESULT_DIR = Path("results/benchmark")
+BASELINE_PATH = RESULT_DIR / "client_overhead_baseline.json"
+FAKE_DATA_PATH = Path("fake_data/fake_form_data_example.json")
+
+# 模式名稱 -> (引擎, CONNECTION_MODE)；raw_* 為不經過本專案程式碼的最小請求迴圈，作為對照組
+MODES = {
+    "raw_thread": ("thread", None),
+    "raw_async": ("async", None),
+    "thread_per_request": ("thread", "per_request"),
+    "thread_per_user": ("thread", "per_user"),
+    "thread_per_thread": ("thread", "per_thread"),
+    "thread_pooled": ("thread", "pooled"),
+    "async_per_request": ("async", "per_request"),
+    "async_per_user": ("async", "per_user"),
+    "async_per_thread": ("async", "per_thread"),
+    "async_pooled": ("async", "pooled"),
+}
+STEPS_PER_USER = 3
+
+
+# ----------------------
+# 對照組：最小請求迴圈
+# ----------------------
+def raw_thread_users(base_url, users, data):
+    import requests
+
+    def one_user(_):
+        with requests.Session() as s:
+            ok = s.get(f"{base_url}/landing_page").status_code == 200
+            ok &= s.get(f"{base_url}/start_form").status_code == 200
+            ok &= s.post(f"{base_url}/submit_form", json=data).status_code == 200
+        return ok
+
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        return sum(not ok for ok in executor.map(one_user, range(users)))
+
+
+def raw_async_users(base_url, users, data):
+    import aiohttp
+
+    async def one_user(session):
+        ok = True
+        for method, path, kwargs in [("GET", "landing_page", {}), ("GET", "start_form", {}),
+                                     ("POST", "submit_form", {"json": data})]:
+            async with session.request(method, f"{base_url}/{path}", **kwargs) as r:
+                await r.read()
+                ok &= r.status == 200
+        return ok
+
+    async def main():
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+            results = await asyncio.gather(*[one_user(session) for _ in range(users)])
+        return sum(not ok for ok in results)
+
+    return asyncio.run(main())
+
+
+# ----------------------
+# 子程序：量測單一模式
+# ----------------------
+def run_child(mode, users, port):
+    """在獨立程序中執行一個模式，CPU 與記憶體只計入壓測客戶端本身"""
+    engine, connection_mode = MODES[mode]
+    base_url = f"http://127.0.0.1:{port}"
+    with open(FAKE_DATA_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)[0]
+
+    if connection_mode is None:
+        raw = raw_thread_users if engine == "thread" else raw_async_users
+        run = lambda n: raw(base_url, n, data)
+    else:
+        import core.api_test_core as core
+        import core.async_engine as async_engine
+        import test_tool.high_concurrency as hc
+
+        # 改指向 null server 與固定的範例假資料，其餘沿用測試工具本身的程式碼路徑
+        core.BASE_URL = async_engine.BASE_URL = base_url
+        core.CONNECTION_MODE = async_engine.CONNECTION_MODE = connection_mode
+        core.FAKE_DATA_PATH = FAKE_DATA_PATH
+        hc.ENGINE = engine
+
+        def run(n):
+            failed = []
+            hc.run_users(range(1, n + 1), n, lambda res: failed.append(not res["success"]))
+            return sum(failed)
+
+    run(min(users, 20))  # 暖身：載入模組、建立連線池
+
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    errors = run(users)
+    wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    requests_done = users * STEPS_PER_USER
+    return {
+        "mode": mode,
+        "users": users,
+        "requests": requests_done,
+        "failed_users": errors,
+        "wall": wall,
+        "requests_per_sec": requests_done / wall,
+        "cpu_per_request_us": cpu / requests_done * 1e6,
+        "cpu_utilization": cpu / wall,
+        # ru_maxrss 在 Linux 為 KB
+        "memory_per_user_kb": max(0, rss1 - rss0) / users
+    }
+
+
+# ----------------------
+# 主程序
+# ----------------------
+def wait_ready(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/start_form", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"null server 未在 {timeout} 秒內啟動")
+
+
+def measure(mode, users, port, repeat):
+    """每個模式跑 repeat 次，取吞吐量最高的一次以降低雜訊"""
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-m", "benchmark.client_overhead", "--child", mode,
+                              "--users", str(users), "--port", str(port)],
+                             check=True, capture_output=True, text=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if best is None or result["requests_per_sec"] > best["requests_per_sec"]:
+            best = result
+    return best
+
+
+def run_suite(modes, thread_users, async_users, repeat, port):
+    server = subprocess.Popen([sys.executable, "-m", "benchmark.null_server", "--port", str(port)])
+    try:
+        wait_ready(port)
+        results = {}
+        for mode in modes:
+            users = thread_users if MODES[mode][0] == "thread" else async_users
+            results[mode] = r = measure(mode, users, port, repeat)
+            print(f"{mode:20s} | {r['requests_per_sec']:9.1f} req/s | {r['cpu_per_request_us']:8.1f} us CPU/req | "
+                  f"{r['memory_per_user_kb']:7.1f} KB/user | failed {r['failed_users']}")
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "thread_users": thread_users,
+        "async_users": async_users,
+        "repeat": repeat,
+        "modes": results
+    }
+
+
+def compare(report, baseline, threshold):
+    """
+    與 baseline 比較各模式的吞吐量，下降超過 threshold（比例）即視為退化。
+
+    Returns:
+        list: 退化的模式說明，空清單表示通過。
+    """
+    regressions = []
+    for mode, base in baseline["modes"].items():
+        current = report["modes"].get(mode)
+        if current is None:
+            continue
+        change = current["requests_per_sec"] / base["requests_per_sec"] - 1
+        print(f"{mode:20s} | baseline {base['requests_per_sec']:9.1f} | now {current['requests_per_sec']:9.1f} | "
+              f"{change:+.1%}")
+        if change < -threshold:
+            regressions.append(f"{mode}: {change:+.1%} (threshold -{threshold:.0%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Client-side overhead benchmark against a local null server")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--thread_users", type=int, default=200, help="Virtual users per run for thread modes")
+    parser.add_argument("--async_users", type=int, default=1000, help="Virtual users per run for async modes")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode, best is kept")
+    parser.add_argument("--port", type=int, default=5098)
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save_baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--check", action="store_true", help="Fail if throughput regressed against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed throughput drop (fraction)")
+    parser.add_argument("--child", choices=list(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--users", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.users, args.port)))
+        sys.exit(0)
+
+    report = run_suite(args.modes, args.thread_users, args.async_users, args.repeat, args.port)
+
+    RESULT_DIR.mkdir(parents=True, exist_ok=True)
+    result_file = RESULT_DIR / f"client_overhead_{report['timestamp']}.json"
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Result: {result_file}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved: {baseline_path}")
+
+    if args.check:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print("REGRESSION: " + "; ".join(regressions))
+            sys.exit(1)
+        print("No regression")
@@ -0,0 +1,152 @@
+# benchmark/log_overhead.py
+import argparse
+import json
+import logging
+import queue
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+
+from core.log_pipeline import LogPipeline
+
+RESULT_DIR = Path("results/benchmark")
+LOG_FORMAT = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
+MESSAGE = "User %s finished, success: %s, total_time: %.3fs"
+
+# file_handler：原本 high_concurrency 的寫法（同步 FileHandler + f-string）
+# queue_handler：標準函式庫的 QueueHandler + QueueListener
+# pipeline / pipeline_sampled：core/log_pipeline.py，後者只保留 1% 的逐用戶訊息
+BACKENDS = ["file_handler", "queue_handler", "pipeline", "pipeline_sampled"]
+
+
+# ----------------------
+# 各種 log 寫法
+# ----------------------
+def make_backend(name, path):
+    """回傳 (log(i), close())"""
+    if name.startswith("pipeline"):
+        pipeline = LogPipeline(path, sample_rate=0.01 if name == "pipeline_sampled" else 1.0, seed=0)
+        return (lambda i: pipeline.sample(MESSAGE, i, True, 0.123)), pipeline.close
+
+    logger = logging.getLogger(f"log_overhead.{name}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.handlers.clear()
+    fh = logging.FileHandler(path, mode="w", encoding="utf-8")
+    fh.setFormatter(LOG_FORMAT)
+
+    if name == "file_handler":
+        logger.addHandler(fh)
+
+        def close():
+            logger.removeHandler(fh)
+            fh.close()
+    else:
+        q = queue.SimpleQueue()
+        listener = QueueListener(q, fh)
+        handler = QueueHandler(q)
+        logger.addHandler(handler)
+        listener.start()
+
+        def close():
+            listener.stop()
+            logger.removeHandler(handler)
+            fh.close()
+
+    return (lambda i: logger.info(f"User {i} finished, success: {True}, total_time: {0.123:.3f}s")), close
+
+
+def run_case(name, threads, calls):
+    """threads 個線程各呼叫 calls 次，量測呼叫端的成本與背景寫出完成所需時間"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.log"
+        log, close = make_backend(name, path)
+        barrier = threading.Barrier(threads + 1)
+        cpu = [0] * threads
+
+        def worker(k):
+            barrier.wait()
+            c0 = time.thread_time_ns()
+            for i in range(calls):
+                log(i)
+            cpu[k] = time.thread_time_ns() - c0
+
+        workers = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+        for t in workers:
+            t.start()
+        p0 = time.process_time_ns()
+        barrier.wait()
+        t0 = time.perf_counter_ns()
+        for t in workers:
+            t.join()
+        t1 = time.perf_counter_ns()
+        close()
+        t2 = time.perf_counter_ns()
+        p1 = time.process_time_ns()
+
+        with open(path, "rb") as f:
+            lines = sum(1 for _ in f)
+
+    total = threads * calls
+    return {
+        "backend": name,
+        "threads": threads,
+        "calls": total,
+        # 呼叫端線程本身耗用的 CPU，即測試線程上的 log 成本
+        "hot_path_cpu_ns": sum(cpu) / total,
+        # 所有線程完成呼叫的牆鐘時間，含 GIL 與 handler 鎖的等待
+        "wall_ns_per_call": (t1 - t0) / total,
+        # 整個程序（含背景寫出線程）的 CPU 成本
+        "total_cpu_ns_per_call": (p1 - p0) / total,
+        "drain_s": (t2 - t1) / 1e9,
+        "lines_written": lines
+    }
+
+
+# ----------------------
+# 主流程
+# ----------------------
+def run_benchmark(backends, thread_counts, calls, budget_us):
+    results = []
+    for threads in thread_counts:
+        for name in backends:
+            r = run_case(name, threads, calls)
+            results.append(r)
+            print(f"{name:16s} | threads {threads:2d} | hot path {r['hot_path_cpu_ns'] / 1000:6.2f} us | "
+                  f"wall {r['wall_ns_per_call'] / 1000:6.2f} us | total CPU {r['total_cpu_ns_per_call'] / 1000:6.2f} us | "
+                  f"drain {r['drain_s']:.3f}s | lines {r['lines_written']}")
+
+    over = [r for r in results if r["backend"].startswith("pipeline") and r["hot_path_cpu_ns"] > budget_us * 1000]
+
+    RESULT_DIR.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    result_file = RESULT_DIR / f"log_overhead_{timestamp}.json"
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump({
+            "calls_per_thread": calls,
+            "budget_us": budget_us,
+            "within_budget": not over,
+            "results": results
+        }, f, indent=2)
+    print(f"Result: {result_file}")
+    return not over
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-call cost of logging on the load generator's hot path")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--calls", type=int, default=100000, help="Log calls per thread")
+    parser.add_argument("--budget_us", type=float, default=5.0,
+                        help="Max hot path CPU per call for the pipeline backends (microseconds)")
+    args = parser.parse_args()
+
+    if run_benchmark(args.backends, args.threads, args.calls, args.budget_us):
+        print(f"Pipeline hot path within {args.budget_us} us per call")
+    else:
+        print(f"Pipeline hot path exceeded {args.budget_us} us per call")
+        sys.exit(1)
@@ -0,0 +1,45 @@
+# benchmark/null_server.py
+import argparse
+import json
+
+from aiohttp import web
+
+from app.responses import build_response_bodies
+from utils.system import raise_fd_limit
+
+# 與正式服務相同大小的回應，但沒有延遲、成功率模型與併發追蹤
+BODIES = build_response_bodies({})
+SUBMIT_BODY = json.dumps({"message": "表單提交成功！"}).encode("utf-8")
+
+
+# ----------------------
+# 零延遲路由
+# ----------------------
+async def landing_page(request):
+    return web.Response(body=BODIES["landing_page"], content_type="application/json")
+
+
+async def start_form(request):
+    return web.Response(body=BODIES["start_form"], content_type="application/json")
+
+
+async def submit_form(request):
+    await request.read()
+    return web.Response(body=SUBMIT_BODY, content_type="application/json")
+
+
+def create_app():
+    null_app = web.Application()
+    null_app.router.add_get("/landing_page", landing_page)
+    null_app.router.add_get("/start_form", start_form)
+    null_app.router.add_post("/submit_form", submit_form)
+    return null_app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zero-delay stand-in for the three API endpoints")
+    parser.add_argument("--port", type=int, default=5098)
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    web.run_app(create_app(), host="127.0.0.1", port=args.port, backlog=16384, access_log=None, print=None)
@@ -0,0 +1,143 @@
+# benchmark/prefork_scaling.py
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+import aiohttp
+
+RESULT_DIR = Path("results/benchmark")
+
+
+# ----------------------
+# 壓測客戶端
+# ----------------------
+async def _hammer(url, concurrency, duration):
+    """concurrency 條 keep-alive 連線持續打同一個 URL，回傳 (成功數, 失敗數)"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    ok = errors = 0
+
+    async def one_connection(session):
+        nonlocal ok, errors
+        while loop.time() < deadline:
+            try:
+                async with session.get(url) as r:
+                    await r.read()
+                    if r.status == 200:
+                        ok += 1
+                    else:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*[one_connection(session) for _ in range(concurrency)])
+    return ok, errors
+
+
+def client_process(url, concurrency, duration, results):
+    results.put(asyncio.run(_hammer(url, concurrency, duration)))
+
+
+def drive_load(url, client_procs, concurrency, duration):
+    """以多個客戶端程序產生負載，避免客戶端本身先成為瓶頸"""
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=client_process, args=(url, concurrency, duration, results))
+             for _ in range(client_procs)]
+    for p in procs:
+        p.start()
+    totals = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return sum(t[0] for t in totals), sum(t[1] for t in totals)
+
+
+# ----------------------
+# 伺服器啟停
+# ----------------------
+def wait_ready(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1) as r:
+                return json.load(r)
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"伺服器未在 {timeout} 秒內啟動")
+
+
+def run_level(workers, port, route, client_procs, concurrency, duration):
+    server = subprocess.Popen([sys.executable, "-m", "app.prefork_server", "--workers", str(workers),
+                               "--port", str(port), "--no_delay"])
+    try:
+        # 等所有 worker 都開始 listen：/metrics 的 workers 是設定值，要看各 worker 自己標記的 workers_ready
+        deadline = time.monotonic() + 10.0
+        while wait_ready(port).get("workers_ready", 0) < workers:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"只有部分 worker 在 10 秒內就緒（共 {workers} 個）")
+            time.sleep(0.1)
+
+        t0 = time.monotonic()
+        ok, errors = drive_load(f"http://127.0.0.1:{port}/{route}", client_procs, concurrency, duration)
+        elapsed = time.monotonic() - t0
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "workers": workers,
+        "requests": ok,
+        "errors": errors,
+        "elapsed": elapsed,
+        "requests_per_sec": ok / elapsed
+    }
+
+
+# ----------------------
+# 主流程
+# ----------------------
+def run_benchmark(max_workers, port, route, client_procs, concurrency, duration):
+    levels = []
+    for workers in range(1, max_workers + 1):
+        level = run_level(workers, port, route, client_procs, concurrency, duration)
+        level["speedup"] = level["requests_per_sec"] / levels[0]["requests_per_sec"] if levels else 1.0
+        levels.append(level)
+        print(f"workers={workers:2d} | {level['requests_per_sec']:10.1f} req/s | "
+              f"speedup {level['speedup']:.2f}x | errors {level['errors']}")
+
+    RESULT_DIR.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    result_file = RESULT_DIR / f"prefork_scaling_{timestamp}.json"
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump({
+            "route": route,
+            "cpu_count": os.cpu_count(),
+            "client_procs": client_procs,
+            "concurrency_per_client": concurrency,
+            "duration": duration,
+            "levels": levels
+        }, f, indent=2)
+    print(f"Result: {result_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prefork server throughput scaling benchmark")
+    parser.add_argument("--max_workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--route", default="start_form", choices=["landing_page", "start_form"])
+    parser.add_argument("--client_procs", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--concurrency", type=int, default=64, help="Connections per client process")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per level")
+    args = parser.parse_args()
+
+    run_benchmark(args.max_workers, args.port, args.route, args.client_procs, args.concurrency, args.duration)
@@ -1,8 +1,23 @@
 # core/simple_api_test_core.py
+import io
 import json
+import sys
 import time
+import threading
 import requests
+from contextlib import contextmanager
 from pathlib import Path
+from urllib.parse import unquote, urlsplit
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from core.payload_feeder import PayloadFeeder
+from core.retry import RetryPolicy
+from core.trace import record_request
+from core.timing import now_ns, phase_timing
 
 # 讀取 config
 CONFIG_PATH = Path("config/core.json")
@@ -11,38 +26,386 @@ with open(CONFIG_PATH, "r", encoding="utf-8") as f:
 
 BASE_URL = config.get("BASE_URL", "http://127.0.0.1:5000")
 
-# 假資料路徑
-FAKE_DATA_PATH = Path("fake_data/fake_form_data.json")
-with open(FAKE_DATA_PATH, "r", encoding="utf-8") as f:
-    fake_data_list = json.load(f)
+# 連線模式
+#   per_request：每個請求都開新連線（與 module-level requests.get/post 相同）
+#   per_user：每位虛擬用戶一個 keep-alive session，模擬瀏覽器
+#   per_thread：每個線程一個 keep-alive session，跨用戶重用
+#   pooled：全程序共用一個連線池，最多 POOL_SIZE 條連線，模擬後端服務
+CONNECTION_MODE = config.get("CONNECTION_MODE", "per_request")
+POOL_SIZE = config.get("POOL_SIZE", 10)
+
+# 傳輸方式
+#   http：經由 socket 連到 BASE_URL 的伺服器
+#   wsgi：在本程序內直接呼叫 app/app_server.py 的 Flask app，不經網路，用於量測應用程式本身的吞吐量
+# WSGI_NO_DELAY 為 true 時關閉伺服器的模擬延遲（time.sleep），只剩應用程式的 CPU 成本
+TRANSPORT = config.get("TRANSPORT", "http")
+WSGI_NO_DELAY = config.get("WSGI_NO_DELAY", True)
+
+# 重試策略：收到 retry_on 狀態碼（預設 503）時依指數退避重試，見 core/retry.py
+# max_attempts 為 1（預設）時不重試，行為與原本相同
+RETRY_POLICY = config.get("RETRY_POLICY", {})
+RETRY = RetryPolicy(**RETRY_POLICY)
+
+# 流量紀錄：true 時每個送出的請求寫入 results/traces/trace_<時間>_<pid>.jsonl，可用 test_tool/replay.py 重播
+TRACE_RECORD = config.get("TRACE_RECORD", False)
+
+# 假資料來源：.json（舊格式）/ .jsonl / .bin，送出表單時每位用戶取一筆
+#   sequential：依序循環；random：隨機抽取；sharded：每個 worker 程序只讀自己的區段
+FAKE_DATA_PATH = Path(config.get("PAYLOAD_FILE", "fake_data/fake_form_data.json"))
+PAYLOAD_MODE = config.get("PAYLOAD_MODE", "sequential")
+PAYLOAD_SEED = config.get("PAYLOAD_SEED")
 
 
 def log_result(index, step, success, elapsed, extra_msg=""):
     status = "V" if success else "X"
     print(f"[{status}] #{index+1} | {step} | {elapsed:.3f}s {extra_msg}")
 
+# ----------------------
+# 分階段計時
+# ----------------------
+# 目前線程進行中請求的各時間點，由下方的連線類別在 urllib3 內部填入
+_timing = threading.local()
+
+
+def _mark(name):
+    marks = getattr(_timing, "marks", None)
+    if marks is not None:
+        marks[name] = now_ns()
+
+
+class _TimedConnectionMixin:
+    def connect(self):
+        super().connect()
+        _mark("connected")
+
+    def request(self, *args, **kwargs):
+        # 一般 HTTP 連線在 request() 內才真正連線，connect() 會再把 connected 往後更新
+        _mark("connected")
+        super().request(*args, **kwargs)
+        _mark("sent")
+
+    def getresponse(self):
+        response = super().getresponse()
+        _mark("headers")
+        return response
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """連線池改用會記錄 connect / send / 收到 header 時間點的連線類別"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool
+        }
+
+
+def timed_request(client, method, url, **kwargs):
+    """
+    送出請求並回傳 (response, elapsed, timing)，elapsed 為單調時鐘的秒數，
+    timing 為各階段耗時（ns）與收送位元組數，見 core/timing.py。
+    """
+    marks = _timing.marks = {}
+    ts = time.time()
+    t0 = now_ns()
+    try:
+        r = client.request(method, url, **kwargs)
+    finally:
+        _timing.marks = None
+    end = now_ns()
+    timing = phase_timing(t0, marks.get("connected"), marks.get("sent"), marks.get("headers"), end,
+                          len(r.request.body or b""), len(r.content))
+    if TRACE_RECORD:
+        record_request(ts, method, url, r.status_code, (end - t0) / 1e9, kwargs.get("json"))
+    return r, (end - t0) / 1e9, timing
+
+
+def retry_request(send, status_of=lambda r: r.status_code):
+    """
+    執行 send() -> (response, elapsed, timing)，依 RETRY 策略重試。
+
+    回傳最後一次的 response；elapsed 改為含退避等待的總時間（用戶實際感受到的時間），
+    timing 為最後一次嘗試的各階段耗時，另加上 attempts（送出次數）、attempt_times（每次送出各自的耗時，不含退避）
+    與被預算 / 限流擋下時的 retry_denied。
+    """
+    if not RETRY.enabled:
+        return send()
+    RETRY.on_request()
+    t0 = now_ns()
+    attempt_times = []
+    while True:
+        r, elapsed, timing = send()
+        attempt_times.append(elapsed)
+        attempt = len(attempt_times)
+        delay, reason = RETRY.next_delay(attempt, status_of(r))
+        if delay is None:
+            break
+        time.sleep(delay)
+    timing = {**timing, "attempts": attempt, "attempt_times": attempt_times}
+    if reason in ("budget", "rate_limited"):
+        timing["retry_denied"] = reason
+    return r, (now_ns() - t0) / 1e9, timing
+
+
+# ----------------------
+# 程序內 WSGI 傳輸
+# ----------------------
+_wsgi_app = None
+_wsgi_lock = threading.Lock()
+_route_cpu = {}
+_route_cpu_lock = threading.Lock()
+
+
+def get_wsgi_app():
+    """首次使用時才載入 Flask app（會讀取 config/server_config.json）"""
+    global _wsgi_app
+    if _wsgi_app is None:
+        with _wsgi_lock:
+            if _wsgi_app is None:
+                import app.app_server as server
+                if WSGI_NO_DELAY:
+                    server.DELAYS.update({route: 0.0 for route in server.DELAYS})
+                _wsgi_app = server.app
+    return _wsgi_app
+
+
+class WSGIAdapter(BaseAdapter):
+    """
+    requests 的傳輸 adapter，把 PreparedRequest 轉成 WSGI environ 直接呼叫 app，
+    回傳一般的 requests.Response，上層流程與計時方式不需修改。
+    connect 只剩 requests 本身準備請求的時間，send 為 0，ttfb 為 app 產生 header 前的處理時間，
+    read 為走訪回應 body 的時間。
+    同時以 thread_time 累計各路由在 app 內耗用的 CPU，見 wsgi_route_profile()。
+    """
+
+    def __init__(self, app=None):
+        super().__init__()
+        self.app = app or get_wsgi_app()
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        environ = {
+            "REQUEST_METHOD": request.method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": unquote(url.path, encoding="latin-1"),
+            "QUERY_STRING": url.query,
+            "SERVER_NAME": url.hostname or "localhost",
+            "SERVER_PORT": str(url.port or 80),
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": "127.0.0.1",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": url.scheme or "http",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False
+        }
+        for name, value in request.headers.items():
+            key = name.upper().replace("-", "_")
+            if key == "CONTENT_TYPE":
+                environ["CONTENT_TYPE"] = value
+            elif key != "CONTENT_LENGTH":
+                environ[f"HTTP_{key}"] = value
+
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"], started["headers"] = status, headers
+            _mark("headers")
+
+        _mark("connected")
+        _mark("sent")
+        cpu0 = time.thread_time_ns()
+        app_iter = self.app(environ, start_response)
+        try:
+            content = b"".join(app_iter)
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+        _record_route_cpu(environ["PATH_INFO"], time.thread_time_ns() - cpu0)
+
+        response = requests.Response()
+        code, _, reason = started["status"].partition(" ")
+        response.status_code = int(code)
+        response.reason = reason
+        response.headers = CaseInsensitiveDict(started["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = content
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+
+def _record_route_cpu(route, cpu_ns):
+    with _route_cpu_lock:
+        entry = _route_cpu.setdefault(route, [0, 0])
+        entry[0] += 1
+        entry[1] += cpu_ns
+
+
+def wsgi_route_profile(reset=False):
+    """
+    WSGI 傳輸下各路由在 app 內的 CPU 成本。
+
+    Returns:
+        dict: 路由 -> requests / cpu_total（秒）/ cpu_per_request_us。
+    """
+    with _route_cpu_lock:
+        profile = {
+            route: {
+                "requests": count,
+                "cpu_total": cpu_ns / 1e9,
+                "cpu_per_request_us": cpu_ns / count / 1e3
+            }
+            for route, (count, cpu_ns) in sorted(_route_cpu.items())
+        }
+        if reset:
+            _route_cpu.clear()
+    return profile
+
+
+# ----------------------
+# 連線管理
+# ----------------------
+_thread_local = threading.local()
+_pooled_session = None
+_pooled_lock = threading.Lock()
+
+
+class _PerRequestClient:
+    """每個請求用一個新 session（新連線），行為同 requests.get / requests.post，但掛上計時 adapter"""
+
+    def request(self, method, url, **kwargs):
+        with new_session(pool_size=1) as session:
+            return session.request(method, url, **kwargs)
+
+
+_per_request_client = _PerRequestClient()
+
+
+def new_session(pool_size=POOL_SIZE, pool_block=False):
+    """建立一個 keep-alive session，連線池大小為 pool_size；wsgi 傳輸下改掛 WSGIAdapter"""
+    session = requests.Session()
+    if TRANSPORT == "wsgi":
+        adapter = WSGIAdapter()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=pool_block)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """
+    依 CONNECTION_MODE 取得目前線程要使用的 HTTP client。
+    per_request / per_user 模式回傳每個請求都開新連線的 client。
+    """
+    global _pooled_session
+
+    if CONNECTION_MODE == "per_thread":
+        session = getattr(_thread_local, "session", None)
+        if session is None:
+            session = _thread_local.session = new_session(pool_size=1)
+        return session
+
+    if CONNECTION_MODE == "pooled":
+        if _pooled_session is None:
+            with _pooled_lock:
+                if _pooled_session is None:
+                    # pool_block：連線用完時排隊等待，而不是額外開新連線
+                    _pooled_session = new_session(pool_block=True)
+        return _pooled_session
+
+    return _per_request_client
+
+
+@contextmanager
+def user_session():
+    """
+    單一虛擬用戶的連線範圍，per_user 模式下整個流程共用一個 keep-alive session，
+    結束時關閉；其他模式則交給 get_session() 決定。
+    """
+    if CONNECTION_MODE == "per_user":
+        session = new_session(pool_size=1)
+        try:
+            yield session
+        finally:
+            session.close()
+    else:
+        yield get_session()
+
+
+# ----------------------
+# 假資料供應
+# ----------------------
+_feeder = None
+_feeder_lock = threading.Lock()
+
+
+def use_payload_shard(shard_index, shard_count):
+    """分散式 worker 取得編號後呼叫，sharded 模式下只讀取自己的資料區段"""
+    global _feeder
+    with _feeder_lock:
+        if _feeder is not None:
+            _feeder.close()
+        _feeder = PayloadFeeder(FAKE_DATA_PATH, PAYLOAD_MODE, PAYLOAD_SEED, shard_index, shard_count)
+
+
+def next_payload():
+    """取下一位用戶要送出的表單資料，首次呼叫時才開啟假資料檔"""
+    global _feeder
+    if _feeder is None:
+        with _feeder_lock:
+            if _feeder is None:
+                _feeder = PayloadFeeder(FAKE_DATA_PATH, PAYLOAD_MODE, PAYLOAD_SEED)
+    return _feeder.next()
+
+
 # ----------------------
 # 三個核心函式
 # ----------------------
-def visit_landing_page():
-    t0 = time.time()
-    r = requests.get(f"{BASE_URL}/landing_page")
-    elapsed = time.time() - t0
-    return r, elapsed
+def visit_landing_page(session=None):
+    client = session if session is not None else get_session()
+    return retry_request(lambda: timed_request(client, "GET", f"{BASE_URL}/landing_page"))
 
 
-def start_form():
-    t0 = time.time()
-    r = requests.get(f"{BASE_URL}/start_form")
-    elapsed = time.time() - t0
-    return r, elapsed
+def start_form(session=None):
+    client = session if session is not None else get_session()
+    return retry_request(lambda: timed_request(client, "GET", f"{BASE_URL}/start_form"))
 
 
-def submit_form(data):
-    t0 = time.time()
-    r = requests.post(f"{BASE_URL}/submit_form", json=data)
-    elapsed = time.time() - t0
-    return r, elapsed
+def submit_form(data, session=None):
+    client = session if session is not None else get_session()
+    return retry_request(lambda: timed_request(client, "POST", f"{BASE_URL}/submit_form", json=data))
 
 
 # ----------------------
@@ -51,17 +414,18 @@ def submit_form(data):
 def core_test(data, index=0):
     start_time = time.time()
     try:
-        # 1. 進入首頁
-        r1, elapsed = visit_landing_page()
-        log_result(index, "GET /landing_page", r1.status_code == 200, elapsed)
+        with user_session() as session:
+            # 1. 進入首頁
+            r1, elapsed, _ = visit_landing_page(session)
+            log_result(index, "GET /landing_page", r1.status_code == 200, elapsed)
 
-        # 2. 點擊填表按鈕，拿到空表單
-        r2, elapsed = start_form()
-        log_result(index, "GET /start_form", r2.status_code == 200, elapsed)
+            # 2. 點擊填表按鈕，拿到空表單
+            r2, elapsed, _ = start_form(session)
+            log_result(index, "GET /start_form", r2.status_code == 200, elapsed)
 
-        # 3. 送出表單
-        r3, elapsed = submit_form(data)
-        log_result(index, "POST /submit_form", r3.status_code == 200, elapsed)
+            # 3. 送出表單
+            r3, elapsed, _ = submit_form(data, session)
+            log_result(index, "POST /submit_form", r3.status_code == 200, elapsed)
 
         total_elapsed = time.time() - start_time
         print(f"#{index+1} Full workflow completed, total time {total_elapsed:.3f}s\n")
@@ -71,4 +435,4 @@ def core_test(data, index=0):
 
 
 if __name__ == "__main__":
-    core_test(fake_data_list[0], index=0)
\ No newline at end of file
+    core_test(next_payload(), index=0)
\ No newline at end of file
@@ -0,0 +1,98 @@
+# core/arrival.py
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ARRIVAL_MODES = ["constant", "poisson", "ramp"]
+
+
+# ----------------------
+# 到達時間表
+# ----------------------
+def arrival_offsets(period_users, unit_time, mode="constant", seed=None):
+    """
+    將每個 period 的人數轉為連續的到達速率，產生每位用戶的預定開始時間。
+
+    Args:
+        period_users (list[int]): 每個 period 的人數，速率為 users / unit_time。
+        unit_time (float): 每個 period 的秒數。
+        mode (str): constant 等間隔、poisson 指數分佈間隔、ramp 速率在相鄰 period 間線性過渡。
+        seed (int): poisson 模式的亂數種子。
+
+    Yields:
+        (period_index, offset)：offset 為相對測試開始的秒數，依時間遞增。
+    """
+    if mode not in ARRIVAL_MODES:
+        raise ValueError(f"未知的 arrival mode: {mode}")
+
+    rng = random.Random(seed)
+    for p, users in enumerate(period_users):
+        period_start = p * unit_time
+        rate = users / unit_time
+
+        if mode == "constant":
+            for k in range(users):
+                yield p, period_start + k / rate
+
+        elif mode == "poisson":
+            t = rng.expovariate(rate)
+            while t < unit_time:
+                yield p, period_start + t
+                t += rng.expovariate(rate)
+
+        else:  # ramp
+            # r(t) = r0 + (r1 - r0) * t / T，累積人數 N(t) = r0*t + (r1 - r0)*t^2 / (2T)
+            # 解 N(t) = k 得到第 k 位用戶的開始時間
+            next_users = period_users[p + 1] if p + 1 < len(period_users) else users
+            r0, r1 = rate, next_users / unit_time
+            a = (r1 - r0) / (2 * unit_time)
+            expected = (r0 + r1) * unit_time / 2
+            k = 0
+            while k < expected:
+                if abs(a) < 1e-12:
+                    t = k / r0
+                else:
+                    t = (-r0 + math.sqrt(max(0.0, r0 * r0 + 4 * a * k))) / (2 * a)
+                if t >= unit_time:
+                    break
+                yield p, period_start + t
+                k += 1
+
+
+# ----------------------
+# 開放模型執行（線程版）
+# ----------------------
+def run_thread_schedule(user_func, schedule, on_result, max_workers=1000):
+    """
+    依預定開始時間啟動用戶，不等待仍在執行中的用戶（open model）。
+
+    Args:
+        user_func: 單人流程，呼叫方式為 user_func(*args, intended_start=...)。
+        schedule: 依時間遞增的 (intended_start, args)，intended_start 為 time.monotonic() 時間。
+        on_result (callable): 用戶完成時呼叫，會在 worker 線程中執行。
+        max_workers (int): 同時執行的用戶上限，超過時排隊，延遲會反映在 start_lag。
+    """
+    lock = threading.Lock()
+
+    def done(future):
+        res = future.result()
+        with lock:
+            on_result(res)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for intended_start, args in schedule:
+            delay = intended_start - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            future = executor.submit(user_func, *args, intended_start=intended_start)
+            future.add_done_callback(done)
+
+
+def mark_start(result, start_time, intended_start):
+    """記錄預定與實際開始時間（皆為 time.monotonic()），供 coordinated omission 校正"""
+    if intended_start is not None:
+        result["intended_start"] = intended_start
+        result["actual_start"] = start_time
+        result["start_lag"] = start_time - intended_start
@@ -0,0 +1,208 @@
+# core/async_engine.py
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from core.api_test_core import BASE_URL, CONNECTION_MODE, POOL_SIZE, RETRY, TRACE_RECORD
+from core.self_profile import start_loop_probe
+from core.timing import now_ns, phase_timing
+from core.trace import record_request
+from utils.system import raise_fd_limit
+
+
+# ----------------------
+# 分階段計時
+# ----------------------
+async def _mark_connected(session, ctx, params):
+    if isinstance(ctx.trace_request_ctx, dict):
+        ctx.trace_request_ctx["connected"] = now_ns()
+
+
+async def _mark_sent(session, ctx, params):
+    if isinstance(ctx.trace_request_ctx, dict):
+        ctx.trace_request_ctx["sent"] = now_ns()
+
+
+async def _mark_headers(session, ctx, params):
+    if isinstance(ctx.trace_request_ctx, dict):
+        ctx.trace_request_ctx["headers"] = now_ns()
+
+
+def new_trace_config():
+    """記錄取得連線、送出請求與收到 response header 的時間點，建立 ClientSession 時傳入"""
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_create_end.append(_mark_connected)
+    trace.on_connection_reuseconn.append(_mark_connected)
+    trace.on_request_headers_sent.append(_mark_sent)
+    trace.on_request_chunk_sent.append(_mark_sent)
+    # on_request_end 在讀完 response header、尚未讀 body 時觸發
+    trace.on_request_end.append(_mark_headers)
+    return trace
+
+
+def new_client_session(connector, timeout):
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[new_trace_config()])
+
+
+async def timed_request(session, method, url, **kwargs):
+    """與 api_test_core.timed_request 相同，回傳 (response, elapsed, timing)"""
+    payload = b""
+    body = kwargs.pop("json", None)
+    if body is not None:
+        # 自行序列化，才知道送出的 body 大小（aiohttp 內部同樣使用 json.dumps）
+        payload = json.dumps(body).encode("utf-8")
+        kwargs.update(data=payload, headers={"Content-Type": "application/json"})
+    marks = {}
+    ts = time.time()
+    t0 = now_ns()
+    async with session.request(method, url, trace_request_ctx=marks, **kwargs) as r:
+        content = await r.read()
+    end = now_ns()
+    timing = phase_timing(t0, marks.get("connected"), marks.get("sent"), marks.get("headers"), end,
+                          len(payload), len(content))
+    if TRACE_RECORD:
+        record_request(ts, method, url, r.status, (end - t0) / 1e9, body)
+    return r, (end - t0) / 1e9, timing
+
+
+async def retry_request(send):
+    """與 api_test_core.retry_request 相同，send 為回傳 coroutine 的函式，退避以 asyncio.sleep 等待"""
+    if not RETRY.enabled:
+        return await send()
+    RETRY.on_request()
+    t0 = now_ns()
+    attempt_times = []
+    while True:
+        r, elapsed, timing = await send()
+        attempt_times.append(elapsed)
+        attempt = len(attempt_times)
+        delay, reason = RETRY.next_delay(attempt, r.status)
+        if delay is None:
+            break
+        await asyncio.sleep(delay)
+    timing = {**timing, "attempts": attempt, "attempt_times": attempt_times}
+    if reason in ("budget", "rate_limited"):
+        timing["retry_denied"] = reason
+    return r, (now_ns() - t0) / 1e9, timing
+
+
+# ----------------------
+# 非同步版三個核心函式
+# ----------------------
+# 與 api_test_core 相同的流程與回傳格式 (response, elapsed, timing)，
+# 差別在於 response 為 aiohttp 物件（狀態碼欄位為 r.status）
+async def async_visit_landing_page(session):
+    return await retry_request(lambda: timed_request(session, "GET", f"{BASE_URL}/landing_page"))
+
+
+async def async_start_form(session):
+    return await retry_request(lambda: timed_request(session, "GET", f"{BASE_URL}/start_form"))
+
+
+async def async_submit_form(session, data):
+    return await retry_request(lambda: timed_request(session, "POST", f"{BASE_URL}/submit_form", json=data))
+
+
+# ----------------------
+# 工具函式
+# ----------------------
+def new_connector(connection_limit):
+    """
+    依 CONNECTION_MODE 建立共用 connector，單一事件迴圈下 per_thread 等同於共用 keep-alive 連線池
+    """
+    if CONNECTION_MODE == "per_request":
+        return aiohttp.TCPConnector(limit=connection_limit, force_close=True)
+    if CONNECTION_MODE == "pooled":
+        return aiohttp.TCPConnector(limit=POOL_SIZE)
+    return aiohttp.TCPConnector(limit=connection_limit)
+
+
+# ----------------------
+# 事件迴圈執行
+# ----------------------
+async def _run_one(user_coro, shared_session, args, intended_start=None):
+    kwargs = {} if intended_start is None else {"intended_start": intended_start}
+    if CONNECTION_MODE == "per_user":
+        # 每位用戶自己的 keep-alive 連線，流程結束即關閉
+        connector = aiohttp.TCPConnector(limit=1)
+        async with new_client_session(connector, shared_session.timeout) as session:
+            return await user_coro(session, *args, **kwargs)
+    return await user_coro(shared_session, *args, **kwargs)
+
+
+async def _run_users(user_coro, args_list, on_result, connection_limit):
+    connector = new_connector(connection_limit)
+    timeout = aiohttp.ClientTimeout(total=None)
+    results = []
+    probe = start_loop_probe()
+    async with new_client_session(connector, timeout) as session:
+        tasks = [asyncio.create_task(_run_one(user_coro, session, args)) for args in args_list]
+        for future in asyncio.as_completed(tasks):
+            res = await future
+            results.append(res)
+            if on_result is not None:
+                on_result(res)
+    if probe is not None:
+        probe.cancel()
+    return results
+
+
+def run_async_users(user_coro, args_list, on_result=None, connection_limit=0):
+    """
+    在單一事件迴圈上以 coroutine 執行所有虛擬用戶，取代一人一線程的 ThreadPoolExecutor。
+
+    Args:
+        user_coro: async 單人流程，呼叫方式為 user_coro(session, *args)。
+        args_list (list[tuple]): 每位用戶的參數，等同 executor.submit 的參數。
+        on_result (callable): 每位用戶完成時呼叫，參數為該用戶的結果。
+        connection_limit (int): 同時開啟的連線上限，0 表示不限制（pooled 模式改用 POOL_SIZE）。
+
+    Returns:
+        list: 依完成順序排列的用戶結果。
+    """
+    raise_fd_limit()
+    return asyncio.run(_run_users(user_coro, args_list, on_result, connection_limit))
+
+
+async def _run_schedule(user_coro, schedule, on_result, connection_limit):
+    connector = new_connector(connection_limit)
+    timeout = aiohttp.ClientTimeout(total=None)
+    loop = asyncio.get_running_loop()
+    # 預定時間為 time.monotonic()，換算到事件迴圈的時鐘（預設兩者相同）
+    ref_mono, ref_loop = time.monotonic(), loop.time()
+    pending = set()
+
+    def done(task):
+        pending.discard(task)
+        if on_result is not None:
+            on_result(task.result())
+
+    probe = start_loop_probe()
+    async with new_client_session(connector, timeout) as session:
+        for intended_start, args in schedule:
+            delay = ref_loop + (intended_start - ref_mono) - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(_run_one(user_coro, session, args, intended_start))
+            pending.add(task)
+            task.add_done_callback(done)
+        while pending:
+            await asyncio.wait(pending)
+    if probe is not None:
+        probe.cancel()
+
+
+def run_async_schedule(user_coro, schedule, on_result=None, connection_limit=0):
+    """
+    依預定開始時間在事件迴圈上啟動用戶（open model），不等待仍在執行中的用戶。
+
+    Args:
+        user_coro: async 單人流程，呼叫方式為 user_coro(session, *args, intended_start=...)。
+        schedule: 依時間遞增的 (intended_start, args)，intended_start 為 time.monotonic() 時間。
+        on_result (callable): 每位用戶完成時呼叫，參數為該用戶的結果。
+        connection_limit (int): 同時開啟的連線上限，0 表示不限制。
+    """
+    raise_fd_limit()
+    asyncio.run(_run_schedule(user_coro, schedule, on_result, connection_limit))
@@ -0,0 +1,135 @@
+# core/capacity.py
+import math
+import time
+from statistics import NormalDist
+
+from core.stats import RunStats
+
+
+# ----------------------
+# SLO 判定
+# ----------------------
+def wilson_interval(successes, total, confidence=0.95):
+    """成功率的 Wilson 信賴區間，樣本少時比常態近似穩定"""
+    if total == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / total
+    denom = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denom
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denom
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def evaluate(stats, min_success_rate, max_p99=None, confidence=0.95):
+    """
+    判斷一個人數等級是否符合 SLO。
+
+    成功率以單側 Wilson 界判斷（每一側的錯誤率為 1 - confidence）：下界仍達標為 pass，
+    上界仍未達標為 fail，跨過門檻則為 unclear，需要更多樣本。p99 直接與上限比較。
+
+    Returns:
+        tuple: (verdict, detail)，verdict 為 pass / fail / unclear。
+    """
+    # 雙側 2c-1 區間的兩端即為信心 c 的單側界
+    low, high = wilson_interval(stats.success_count, stats.total, 2 * confidence - 1)
+    p99 = stats.percentiles()["p99"]
+    detail = {
+        "success_rate": stats.success_rate,
+        "success_rate_ci": [low, high],
+        "p99": p99,
+        "samples": stats.total
+    }
+    if max_p99 is not None and p99 > max_p99:
+        return "fail", detail
+    if low >= min_success_rate:
+        return "pass", detail
+    if high < min_success_rate:
+        return "fail", detail
+    return "unclear", detail
+
+
+def _resolvable(stats, trial, max_trials, min_success_rate, confidence):
+    """以目前成功率推算跑滿 max_trials 次的樣本數，判斷信賴界屆時是否可能不再跨門檻"""
+    total = stats.total * max_trials // trial
+    low, high = wilson_interval(round(stats.success_rate * total), total, 2 * confidence - 1)
+    return low >= min_success_rate or high < min_success_rate
+
+
+# ----------------------
+# 容量搜尋
+# ----------------------
+def search_capacity(run_level, min_success_rate, max_p99=None, start_users=50, max_users=10000,
+                    growth=2.0, resolution=0.05, min_step=10, max_trials=3, confidence=0.95):
+    """
+    先以倍數放大人數找出第一個不符合 SLO 的等級，再於最後通過與首次失敗之間二分搜尋。
+
+    每個等級先跑一次，結果明確（信賴界不跨門檻）就直接判定；不明確時重跑並合併樣本，
+    最多 max_trials 次，仍不明確則以點估計判定。若以目前成功率推算到 max_trials 次的樣本數
+    仍無法判定（例如人數少、成功率接近門檻），不再重跑，直接以點估計判定。
+    上下界差距小於 max(min_step, 下界 * resolution) 時停止。
+
+    Args:
+        run_level (callable): run_level(num_users) 執行一次該人數的測試並回傳 RunStats。
+        min_success_rate (float): 成功率 SLO。
+        max_p99 (float | None): 總時間 p99 上限（秒），None 表示不檢查。
+
+    Returns:
+        dict: max_sustainable_users（最後通過的人數）、bounds（[最後通過, 首次失敗]，
+        首次失敗為 None 表示到 max_users 都未失敗）與各等級的判定結果。
+    """
+    if min_step < 1:
+        raise ValueError("min_step 必須 >= 1，否則二分搜尋無法收斂")
+    t0 = time.monotonic()
+    levels = []
+
+    def check(num_users):
+        stats = RunStats()
+        for trial in range(1, max_trials + 1):
+            stats.merge(run_level(num_users))
+            verdict, detail = evaluate(stats, min_success_rate, max_p99, confidence)
+            if verdict != "unclear":
+                break
+            if trial < max_trials and not _resolvable(stats, trial, max_trials, min_success_rate, confidence):
+                verdict = "pass" if stats.success_rate >= min_success_rate else "fail"
+                detail["decided_by"] = "point_estimate"
+                break
+        else:
+            # 樣本用完仍跨門檻，以點估計決定
+            verdict = "pass" if stats.success_rate >= min_success_rate else "fail"
+            detail["decided_by"] = "point_estimate"
+        levels.append({"users": num_users, "trials": trial, "verdict": verdict, **detail})
+        print(f"[capacity] {num_users} users: {verdict} (success {detail['success_rate']:.2%}, "
+              f"p99 {detail['p99']:.3f}s, trials {trial})")
+        return verdict == "pass"
+
+    # 1. 倍數放大
+    lo, hi = 0, None
+    n = start_users
+    while True:
+        if check(n):
+            lo = n
+            if n >= max_users:
+                break
+            n = min(max_users, max(n + 1, math.ceil(n * growth)))
+        else:
+            hi = n
+            break
+
+    # 2. 二分搜尋
+    if hi is not None:
+        while hi - lo > max(min_step, lo * resolution):
+            mid = (lo + hi) // 2
+            if check(mid):
+                lo = mid
+            else:
+                hi = mid
+
+    return {
+        "max_sustainable_users": lo,
+        "bounds": [lo, hi],
+        "slo": {"min_success_rate": min_success_rate, "max_p99": max_p99, "confidence": confidence},
+        "levels": levels,
+        "runs": sum(level["trials"] for level in levels),
+        "elapsed": time.monotonic() - t0
+    }
@@ -0,0 +1,131 @@
+# core/histogram.py
+import math
+from array import array
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+# ----------------------
+# HDR 風格延遲直方圖
+# ----------------------
+class LatencyHistogram:
+    """
+    固定相對精度的對數-線性直方圖（HDR Histogram 的簡化版）。
+
+    以微秒為單位記錄，每個 2 的次方區間切成等寬的子桶，
+    相對誤差不超過 10^-significant_digits。記錄為 O(1)，
+    記憶體只與可追蹤範圍有關，與樣本數無關，且可直接相加合併。
+    """
+
+    def __init__(self, significant_digits=2, max_seconds=3600):
+        self.significant_digits = significant_digits
+        self.max_seconds = max_seconds
+
+        # 子桶數量：2 的次方且足以表示指定的有效位數
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+
+        self.max_value = int(max_seconds * 1_000_000)
+        self.counts = array("Q", [0]) * (self._index(self.max_value) + 1)
+
+        self.total_count = 0
+        self.total_sum = 0
+        self.min_value = None
+        self.max_recorded = 0
+
+    # ---- 索引計算 ----
+    def _index(self, value):
+        shift = max(0, value.bit_length() - self.sub_bucket_bits)
+        return shift * self.sub_bucket_half + (value >> shift)
+
+    def _highest_equivalent(self, index):
+        if index < self.sub_bucket_count:
+            return index
+        shift = (index - self.sub_bucket_count) // self.sub_bucket_half + 1
+        sub = index - shift * self.sub_bucket_half
+        return ((sub + 1) << shift) - 1
+
+    # ---- 記錄 ----
+    def record(self, seconds):
+        value = min(max(0, int(seconds * 1_000_000 + 0.5)), self.max_value)
+        self.counts[self._index(value)] += 1
+        self.total_count += 1
+        self.total_sum += value
+        if self.min_value is None or value < self.min_value:
+            self.min_value = value
+        if value > self.max_recorded:
+            self.max_recorded = value
+
+    def merge(self, other):
+        if len(other.counts) != len(self.counts):
+            raise ValueError("直方圖設定不同，無法合併")
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.total_count += other.total_count
+        self.total_sum += other.total_sum
+        if other.min_value is not None and (self.min_value is None or other.min_value < self.min_value):
+            self.min_value = other.min_value
+        self.max_recorded = max(self.max_recorded, other.max_recorded)
+        return self
+
+    # ---- 查詢 ----
+    def value_at_percentile(self, percentile):
+        """回傳秒數，為該百分位所在子桶的上界"""
+        if self.total_count == 0:
+            return 0.0
+        target = max(1, math.ceil(percentile / 100 * self.total_count))
+        running = 0
+        for i, c in enumerate(self.counts):
+            running += c
+            if running >= target:
+                return min(self._highest_equivalent(i), self.max_recorded) / 1_000_000
+        return self.max_recorded / 1_000_000
+
+    @property
+    def mean(self):
+        return self.total_sum / self.total_count / 1_000_000 if self.total_count else 0.0
+
+    def percentiles(self):
+        result = {f"p{p:g}": self.value_at_percentile(p) for p in PERCENTILES}
+        result["max"] = self.max_recorded / 1_000_000
+        return result
+
+    def buckets(self):
+        """依序 yield 非零桶的 (上界秒數, 數量)"""
+        for i, c in enumerate(self.counts):
+            if c:
+                yield min(self._highest_equivalent(i), self.max_recorded) / 1_000_000, c
+
+    def cdf(self):
+        """累積分布：每個非零桶一點 (秒, 累積比例)，點數與樣本數無關，報表畫 CDF 用"""
+        points = []
+        running = 0
+        for value, c in self.buckets():
+            running += c
+            points.append((value, running / self.total_count))
+        return points
+
+    # ---- 序列化（只存非零的桶） ----
+    def to_dict(self):
+        return {
+            "significant_digits": self.significant_digits,
+            "max_seconds": self.max_seconds,
+            "total_count": self.total_count,
+            "total_sum": self.total_sum,
+            "min_value": self.min_value,
+            "max_recorded": self.max_recorded,
+            "counts": [[i, c] for i, c in enumerate(self.counts) if c]
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        hist = cls(significant_digits=d["significant_digits"], max_seconds=d["max_seconds"])
+        for i, c in d["counts"]:
+            hist.counts[i] = c
+        hist.total_count = d["total_count"]
+        hist.total_sum = d["total_sum"]
+        hist.min_value = d["min_value"]
+        hist.max_recorded = d["max_recorded"]
+        return hist
@@ -0,0 +1,178 @@
+# core/live_metrics.py
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.histogram import LatencyHistogram, PERCENTILES
+from core.stats import STEP_NAMES
+
+
+# ----------------------
+# 即時指標
+# ----------------------
+class LiveMetrics:
+    """
+    測試進行中的即時指標：滾動吞吐量、執行中用戶數、各步驟延遲百分位與錯誤數。
+
+    record() 只由收集結果的 on_result 呼叫，為單一寫入者不加鎖；user_started() 在 open model 下
+    由各用戶開始執行時呼叫，可能來自多個 worker 線程，因此加鎖。HTTP 端只讀取，可容忍些微不一致。
+    """
+
+    def __init__(self, window=10):
+        self.window = window
+        self.start_time = time.time()
+        self.started = 0
+        self._started_lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+        # 每秒一格的環狀計數，用來算滾動吞吐量與錯誤率
+        self._sec = [0] * window
+        self._done = [0] * window
+        self._errors = [0] * window
+
+        self.step_requests = {name: 0 for name in STEP_NAMES}
+        self.step_errors = {name: 0 for name in STEP_NAMES}
+        # 自測試開始的累計延遲總和，與 step_requests 一起作為 summary 的 _sum / _count
+        self.step_time_sum = {name: 0.0 for name in STEP_NAMES}
+        # 延遲以兩個視窗輪替的直方圖計算，只反映最近 window ~ 2*window 秒
+        self._window_start = time.monotonic()
+        self._current = {name: LatencyHistogram() for name in STEP_NAMES}
+        self._previous = {name: LatencyHistogram() for name in STEP_NAMES}
+
+    # ---- 寫入端 ----
+    def user_started(self, n=1):
+        with self._started_lock:
+            self.started += n
+
+    def record(self, result):
+        now = time.monotonic()
+        sec = int(now)
+        i = sec % self.window
+        if self._sec[i] != sec:
+            self._sec[i] = sec
+            self._done[i] = 0
+            self._errors[i] = 0
+        self._done[i] += 1
+        self.completed += 1
+        if not result["success"]:
+            self._errors[i] += 1
+            self.failed += 1
+
+        if now - self._window_start >= self.window:
+            self._previous = self._current
+            self._current = {name: LatencyHistogram() for name in STEP_NAMES}
+            self._window_start = now
+
+        current = self._current
+        for s in result["steps"]:
+            name = s["step"]
+            self.step_requests[name] += 1
+            self.step_time_sum[name] += s["time"]
+            if not s["success"]:
+                self.step_errors[name] += 1
+            current[name].record(s["time"])
+
+    # ---- 讀取端 ----
+    def snapshot(self):
+        now_sec = int(time.monotonic())
+        # 只計算已結束的完整秒數，避免當前這一秒拉低吞吐量
+        valid = [i for i in range(self.window) if now_sec - self.window <= self._sec[i] < now_sec]
+        done = sum(self._done[i] for i in valid)
+        errors = sum(self._errors[i] for i in valid)
+
+        latency = {}
+        for name in STEP_NAMES:
+            hist = LatencyHistogram().merge(self._previous[name]).merge(self._current[name])
+            latency[name] = hist.percentiles()
+
+        return {
+            "elapsed": time.time() - self.start_time,
+            "users_started": self.started,
+            "users_completed": self.completed,
+            "users_failed": self.failed,
+            "users_in_flight": self.started - self.completed,
+            "throughput": done / self.window,
+            "error_rate": errors / done if done else 0.0,
+            "step_requests": dict(self.step_requests),
+            "step_errors": dict(self.step_errors),
+            "step_time_sum": dict(self.step_time_sum),
+            "step_latency": latency
+        }
+
+    def prometheus(self):
+        snap = self.snapshot()
+        lines = [
+            "# HELP loadgen_users_started_total Virtual users started",
+            "# TYPE loadgen_users_started_total counter",
+            f"loadgen_users_started_total {snap['users_started']}",
+            "# HELP loadgen_users_completed_total Virtual users finished",
+            "# TYPE loadgen_users_completed_total counter",
+            f"loadgen_users_completed_total {snap['users_completed']}",
+            "# HELP loadgen_users_failed_total Virtual users with at least one failed step",
+            "# TYPE loadgen_users_failed_total counter",
+            f"loadgen_users_failed_total {snap['users_failed']}",
+            "# HELP loadgen_users_in_flight Virtual users currently running",
+            "# TYPE loadgen_users_in_flight gauge",
+            f"loadgen_users_in_flight {snap['users_in_flight']}",
+            f"# HELP loadgen_throughput_users_per_second Users finished per second over the last {self.window}s",
+            "# TYPE loadgen_throughput_users_per_second gauge",
+            f"loadgen_throughput_users_per_second {snap['throughput']}",
+            f"# HELP loadgen_error_rate Failed user ratio over the last {self.window}s",
+            "# TYPE loadgen_error_rate gauge",
+            f"loadgen_error_rate {snap['error_rate']}",
+            "# HELP loadgen_step_requests_total Requests per step",
+            "# TYPE loadgen_step_requests_total counter",
+        ]
+        lines += [f'loadgen_step_requests_total{{step="{n}"}} {v}' for n, v in snap["step_requests"].items()]
+        lines += [
+            "# HELP loadgen_step_errors_total Failed requests per step",
+            "# TYPE loadgen_step_errors_total counter",
+        ]
+        lines += [f'loadgen_step_errors_total{{step="{n}"}} {v}' for n, v in snap["step_errors"].items()]
+        lines += [
+            f"# HELP loadgen_step_latency_seconds Step latency (quantiles over the last {self.window}-{2 * self.window}s, sum and count since start)",
+            "# TYPE loadgen_step_latency_seconds summary",
+        ]
+        for name, pct in snap["step_latency"].items():
+            for p in PERCENTILES:
+                lines.append(f'loadgen_step_latency_seconds{{step="{name}",quantile="{p / 100:g}"}} {pct[f"p{p:g}"]}')
+            lines.append(f'loadgen_step_latency_seconds_sum{{step="{name}"}} {snap["step_time_sum"][name]}')
+            lines.append(f'loadgen_step_latency_seconds_count{{step="{name}"}} {snap["step_requests"][name]}')
+        return "\n".join(lines) + "\n"
+
+
+# ----------------------
+# HTTP 端點
+# ----------------------
+def start_metrics_server(metrics, port, host="127.0.0.1"):
+    """
+    在背景線程啟動指標端點：/metrics 為 Prometheus 文字格式，/metrics.json 為 JSON。
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = metrics.prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body = json.dumps(metrics.snapshot()).encode("utf-8")
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # 不在測試輸出中印出每次抓取
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, name="live-metrics", daemon=True)
+    thread.start()
+    print(f"Live metrics: http://{host}:{port}/metrics (JSON: /metrics.json)")
+    return server
@@ -0,0 +1,123 @@
+# core/log_pipeline.py
+import queue
+import random
+import sys
+import threading
+import time
+
+_STOP = object()
+
+
+# ----------------------
+# 非阻塞批次 log
+# ----------------------
+class LogPipeline:
+    """
+    測試線程 / 事件迴圈只把 (時間, 等級, 格式字串, 參數) 放進佇列，
+    字串格式化、時間戳記與寫檔都在背景線程完成，每 batch_size 筆或每 flush_interval 秒寫出一次。
+    輸出格式與原本的 logging.Formatter('%(asctime)s | %(levelname)s | %(message)s') 相同。
+
+    Args:
+        path (Path | None): log 檔路徑，None 表示不寫檔。
+        flush_interval (float): 緩衝最長多久寫到磁碟（秒），程式中斷時最多遺失這段時間的 log。
+        sample_rate (float): sample() 逐筆訊息的保留比例，1.0 為全部保留；info() 不受影響。
+        console (bool): 是否同時把訊息本文輸出到 stdout（同樣由背景線程輸出，不含時間戳記）。
+        seed (int | None): 取樣用的亂數種子。
+    """
+
+    def __init__(self, path=None, flush_interval=1.0, sample_rate=1.0, console=False,
+                 batch_size=1000, buffer_size=1 << 20, seed=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self.console = console
+        self.batch_size = batch_size
+        self.written = 0
+        self.sampled_out = 0  # 統計用，多線程下為近似值
+
+        self._random = random.Random(seed).random
+        self._queue = queue.SimpleQueue()
+        self._put = self._queue.put
+        self._file = open(path, "w", encoding="utf-8", buffering=buffer_size) if path is not None else None
+        self._last_second = None
+        self._last_prefix = ""
+        self._thread = threading.Thread(target=self._writer, name="log-pipeline", daemon=True)
+        self._thread.start()
+
+    # ---- 呼叫端（熱路徑） ----
+    def info(self, msg, *args):
+        self._put((time.time(), "INFO", msg, args))
+
+    def warning(self, msg, *args):
+        self._put((time.time(), "WARNING", msg, args))
+
+    def sample(self, msg, *args):
+        """逐請求 / 逐用戶的訊息，依 sample_rate 取樣"""
+        if self.sample_rate < 1.0 and self._random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        self._put((time.time(), "INFO", msg, args))
+
+    # ---- 背景線程 ----
+    def _format(self, created, level, msg, args):
+        """回傳 (檔案用的完整一行, console 用的訊息本文)"""
+        second = int(created)
+        if second != self._last_second:
+            self._last_second = second
+            self._last_prefix = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        if args:
+            try:
+                msg = msg % args
+            except (TypeError, ValueError):
+                msg = f"{msg} {args}"
+        return f"{self._last_prefix},{int((created - second) * 1000):03d} | {level} | {msg}", msg
+
+    def _writer(self):
+        q = self._queue
+        last_flush = time.monotonic()
+        stop = False
+        while not stop:
+            try:
+                item = q.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            lines = []
+            while item is not None:
+                if item is _STOP:
+                    stop = True
+                    break
+                lines.append(self._format(*item))
+                if len(lines) >= self.batch_size:
+                    break
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            if lines:
+                if self._file is not None:
+                    self._file.write("\n".join(line for line, _ in lines) + "\n")
+                if self.console:
+                    sys.stdout.write("\n".join(msg for _, msg in lines) + "\n")
+                self.written += len(lines)
+
+            now = time.monotonic()
+            if stop or now - last_flush >= self.flush_interval:
+                last_flush = now
+                if self._file is not None:
+                    self._file.flush()
+                if self.console:
+                    sys.stdout.flush()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,124 @@
+# core/payload_feeder.py
+import itertools
+import json
+import mmap
+import random
+import threading
+from pathlib import Path
+
+from utils.fake_data_format import build_record, read_binary_header
+
+FEED_MODES = ["sequential", "random", "sharded"]
+
+
+# ----------------------
+# 假資料供應器
+# ----------------------
+class PayloadFeeder:
+    """
+    以 mmap 開啟假資料檔，依序、隨機或分片地交給每位虛擬用戶一筆不同的資料。
+
+    開檔只做 mmap 與定位，不解析整個檔案，啟動時間與常駐記憶體不隨資料量成長：
+      - .bin：固定寬度的欄位編碼，第 i 筆直接以位移讀取
+      - .jsonl：以位元組範圍切分，取資料時才往後找換行並解析該行
+      - .json：舊格式的單一 JSON 陣列，只能整份載入，適合小檔案
+
+    sharded 模式與 sequential 相同依序讀取，但每個 worker 程序只讀取檔案中
+    屬於自己的連續區段（shard_index / shard_count），彼此不重複。
+    """
+
+    def __init__(self, path, mode="sequential", seed=None, shard_index=0, shard_count=1):
+        if mode not in FEED_MODES:
+            raise ValueError(f"unknown feed mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self._rng = random.Random(seed)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._file = None
+        self._mm = None
+
+        if mode != "sharded":
+            shard_index, shard_count = 0, 1
+
+        suffix = self.path.suffix
+        if suffix == ".json":
+            with open(self.path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            lo, hi = _shard_range(0, len(records), shard_index, shard_count)
+            self._records = records[lo:hi]
+            self.count = len(self._records)
+            self._get = self._get_list
+        else:
+            self._file = open(self.path, "rb")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if suffix == ".bin":
+                self._fields, data_offset = read_binary_header(self._file)
+                self._row_size = len(self._fields)
+                lo, hi = _shard_range(0, (len(self._mm) - data_offset) // self._row_size, shard_index, shard_count)
+                self._start = data_offset + lo * self._row_size
+                self.count = hi - lo
+                self._get = self._get_binary
+            else:
+                lo, hi = _shard_range(0, len(self._mm), shard_index, shard_count)
+                # 範圍邊界對齊到行首，每一行恰好屬於一個 shard
+                self._start = self._line_start(lo)
+                self._end = self._line_start(hi)
+                self._cursor = self._start
+                self.count = None  # 不掃描整個檔案，筆數未知
+                self._get = self._get_jsonl
+
+        if self.count == 0 or (self.count is None and self._start >= self._end):
+            self.close()
+            raise ValueError(f"no records in shard {shard_index}/{shard_count} of {self.path}")
+
+    # ---- 取資料 ----
+    def next(self):
+        """取下一筆資料，可同時由多個線程或 coroutine 呼叫"""
+        return self._get()
+
+    def _get_list(self):
+        if self.mode == "random":
+            return self._records[self._rng.randrange(self.count)]
+        return self._records[next(self._counter) % self.count]
+
+    def _get_binary(self):
+        if self.mode == "random":
+            i = self._rng.randrange(self.count)
+        else:
+            i = next(self._counter) % self.count
+        offset = self._start + i * self._row_size
+        return build_record(self._fields, self._mm[offset:offset + self._row_size])
+
+    def _get_jsonl(self):
+        mm = self._mm
+        if self.mode == "random":
+            # 隨機位移所在的那一行；各行長度相近時近似均勻抽樣
+            pos = max(mm.rfind(b"\n", self._start, self._rng.randrange(self._start, self._end)) + 1, self._start)
+            end = mm.find(b"\n", pos, self._end)
+        else:
+            with self._lock:
+                pos = self._cursor
+                end = mm.find(b"\n", pos, self._end)
+                # 讀到區段結尾後從頭循環
+                self._cursor = self._start if end == -1 or end + 1 >= self._end else end + 1
+        return json.loads(mm[pos:self._end if end == -1 else end])
+
+    def _line_start(self, pos):
+        """pos 之後（含）第一個行首"""
+        if pos == 0:
+            return 0
+        if pos >= len(self._mm):
+            return len(self._mm)
+        nl = self._mm.find(b"\n", pos - 1)
+        return len(self._mm) if nl == -1 else nl + 1
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+
+
+def _shard_range(lo, hi, shard_index, shard_count):
+    size = hi - lo
+    return lo + size * shard_index // shard_count, lo + size * (shard_index + 1) // shard_count
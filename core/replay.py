@@ -0,0 +1,142 @@
+# core/replay.py
+import asyncio
+import heapq
+import json
+import time
+from collections import Counter
+
+import aiohttp
+
+from core.async_engine import new_client_session, timed_request
+from core.histogram import LatencyHistogram
+from utils.system import raise_fd_limit
+
+# 記錄時依完成順序寫出，與送出順序最多差一個請求的延遲；以此大小的小根堆重新排序
+REORDER_WINDOW = 10000
+# 距離預定時間小於此值時不再 asyncio.sleep（epoll 逾時以毫秒計），改為讓出事件迴圈的忙等
+SPIN_THRESHOLD = 0.002
+# drift 超過此值（秒）的請求計為 late
+LATE_THRESHOLD = 0.001
+
+
+# ----------------------
+# 讀取 trace
+# ----------------------
+def read_trace(path, shard_index=0, shard_count=1, max_requests=None, window=REORDER_WINDOW):
+    """
+    串流讀取 trace，只解析屬於本 shard 的行（第 i 行屬於 i % shard_count），依 ts 遞增 yield。
+    記憶體只與 window 有關，GB 級的 trace 也不需整份載入。
+    """
+    heap = []
+    with open(path, "rb") as f:
+        for i, line in enumerate(f):
+            if max_requests is not None and i >= max_requests:
+                break
+            if i % shard_count != shard_index or not line.strip():
+                continue
+            record = json.loads(line)
+            heapq.heappush(heap, (record["ts"], i, record))
+            if len(heap) > window:
+                yield heapq.heappop(heap)[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+
+def trace_origin(path, window=REORDER_WINDOW):
+    """trace 的起始時間：前 window 行中最小的 ts（記錄順序可能略為亂序）"""
+    origin = None
+    with open(path, "rb") as f:
+        for i, line in enumerate(f):
+            if i >= window:
+                break
+            if line.strip():
+                ts = json.loads(line)["ts"]
+                origin = ts if origin is None else min(origin, ts)
+    if origin is None:
+        raise ValueError(f"{path} 沒有任何請求")
+    return origin
+
+
+# ----------------------
+# 重播
+# ----------------------
+async def _replay(path, base_url, speed, start_wall, origin, shard_index, shard_count,
+                  connection_limit, max_requests):
+    drift = LatencyHistogram()
+    latency = LatencyHistogram()
+    statuses = Counter()
+    errors = late = 0
+    last_ts = origin
+    pending = set()
+
+    # 以 perf_counter 計時，起點換算自各程序共用的牆鐘時間
+    clock = time.perf_counter
+    start = clock() + (start_wall - time.time())
+    first_target = last_issue = None
+
+    async def send(record):
+        nonlocal errors
+        kwargs = {"json": record["body"]} if record.get("body") is not None else {}
+        try:
+            r, elapsed, _ = await timed_request(session, record["method"], base_url + record["route"], **kwargs)
+            statuses[r.status] += 1
+            latency.record(elapsed)
+        except (aiohttp.ClientError, OSError, asyncio.TimeoutError):
+            errors += 1
+
+    connector = aiohttp.TCPConnector(limit=connection_limit)
+    async with new_client_session(connector, aiohttp.ClientTimeout(total=None)) as session:
+        for record in read_trace(path, shard_index, shard_count, max_requests):
+            target = start + (record["ts"] - origin) / speed
+            delay = target - clock()
+            if delay > SPIN_THRESHOLD:
+                await asyncio.sleep(delay - SPIN_THRESHOLD)
+            while clock() < target:
+                await asyncio.sleep(0)
+            last_issue = clock()
+            lag = last_issue - target
+            drift.record(lag)
+            if lag > LATE_THRESHOLD:
+                late += 1
+            if first_target is None:
+                first_target = target
+            last_ts = max(last_ts, record["ts"])
+
+            task = asyncio.create_task(send(record))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.wait(pending)
+
+    return {
+        "requests": drift.total_count,
+        "errors": errors,
+        "late": late,
+        "last_ts": last_ts,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        # 相對共同起點的秒數，合併各 shard 時用來計算實際送出速率
+        "first_offset": (first_target - start) if drift.total_count else 0.0,
+        "last_offset": (last_issue - start) if drift.total_count else 0.0,
+        "drift": drift.to_dict(),
+        "latency": latency.to_dict()
+    }
+
+
+def replay_shard(path, base_url, speed=1.0, start_wall=None, origin=None, shard_index=0, shard_count=1,
+                 connection_limit=0, max_requests=None):
+    """
+    在單一事件迴圈上依原始間隔（除以 speed）重新送出 trace 中屬於本 shard 的請求（open model，
+    不等待前面的請求完成）。各 shard 在不同程序中以相同的 start_wall / origin 對齊時間軸。
+
+    Returns:
+        dict: 請求數、錯誤數、late 數（drift 超過 LATE_THRESHOLD）、狀態碼分布，
+        以及 drift（實際送出 - 預定時間）與延遲直方圖（to_dict 格式）。
+    """
+    raise_fd_limit()
+    if origin is None:
+        origin = trace_origin(path)
+    if start_wall is None:
+        start_wall = time.time() + 0.5
+    return asyncio.run(_replay(path, base_url, speed, start_wall, origin, shard_index, shard_count,
+                               connection_limit, max_requests))
@@ -0,0 +1,118 @@
+# core/result_sink.py
+import json
+import queue
+import threading
+from pathlib import Path
+
+from core.result_store import ResultStore
+
+_STOP = object()
+
+
+# ----------------------
+# 串流結果寫入
+# ----------------------
+class ResultSink:
+    """
+    將每筆完成的結果交給背景線程，以 JSON Lines 批次寫入檔案。
+
+    呼叫端（測試線程或事件迴圈）只做一次 queue.put，
+    序列化與磁碟 I/O 都在背景線程完成，記憶體只與佇列中尚未寫出的筆數有關。
+    """
+
+    def __init__(self, path, batch_size=1000, buffer_size=1 << 20):
+        self.path = path
+        self.batch_size = batch_size
+        self.count = 0
+        self._queue = queue.SimpleQueue()
+        self._file = self._open(path, buffer_size)
+        self._thread = threading.Thread(target=self._writer, name="result-sink", daemon=True)
+        self._thread.start()
+
+    def _open(self, path, buffer_size):
+        return open(path, "w", encoding="utf-8", buffering=buffer_size)
+
+    def write(self, record):
+        self._queue.put(record)
+
+    def _write_batch(self, batch):
+        self._file.write("\n".join(json.dumps(item, ensure_ascii=False) for item in batch) + "\n")
+
+    def _flush(self):
+        pass
+
+    def _writer(self):
+        q = self._queue
+        while True:
+            item = q.get()
+            batch = []
+            stop = False
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(batch)
+                self.count += len(batch)
+            if stop:
+                self._flush()
+                break
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class BinaryResultSink(ResultSink):
+    """
+    以 ResultStore 的欄式二進位 chunk 寫出結果，每個步驟 31 bytes，
+    可用 ResultStore.load() 讀回，columns() 取得 numpy 欄位。
+    """
+
+    def __init__(self, path, batch_size=1000, buffer_size=1 << 20, chunk_rows=65536):
+        self.chunk_rows = chunk_rows
+        self._store = ResultStore()
+        super().__init__(path, batch_size=batch_size, buffer_size=buffer_size)
+
+    def _open(self, path, buffer_size):
+        return open(path, "wb", buffering=buffer_size)
+
+    def _write_batch(self, batch):
+        for item in batch:
+            self._store.add_result(item)
+        if len(self._store) >= self.chunk_rows:
+            self._flush()
+
+    def _flush(self):
+        if len(self._store):
+            self._store.write_chunk(self._file)
+            self._store.clear()
+
+
+def open_sink(path, fmt="jsonl"):
+    """
+    依格式開啟結果檔，path 不含副檔名。
+
+    Args:
+        path (Path): 輸出路徑（不含副檔名）。
+        fmt (str): jsonl 為完整 JSON Lines，binary 為欄式二進位記錄。
+    """
+    path = Path(path)
+    if fmt == "binary":
+        return BinaryResultSink(path.with_suffix(".bin"))
+    return ResultSink(path.with_suffix(".jsonl"))
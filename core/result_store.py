@@ -0,0 +1,140 @@
+# core/result_store.py
+import math
+import struct
+from array import array
+
+import numpy as np
+
+from core.histogram import PERCENTILES
+from core.stats import STEP_NAMES
+
+STEP_IDS = {name: i for i, name in enumerate(STEP_NAMES)}
+# 用戶流程中途拋出例外時額外寫入的一列：status 為 0、start_ns 為例外發生時間、duration_ns 為 0
+ERROR_STEP = -1
+
+# 欄位名稱、array typecode、對應的 numpy dtype（每筆 31 bytes）
+COLUMNS = [
+    ("user", "q", np.int64),
+    ("period", "i", np.int32),
+    ("step", "b", np.int8),
+    ("status", "h", np.int16),
+    ("start_ns", "q", np.int64),
+    ("duration_ns", "q", np.int64),
+]
+
+CHUNK_MAGIC = b"RSC1"
+CHUNK_HEADER = struct.Struct("<4sI")
+
+
+# ----------------------
+# 欄式結果儲存
+# ----------------------
+class ResultStore:
+    """
+    以型別化陣列逐欄存放每個步驟的結果（user, period, step, status, start_ns, duration_ns），
+    取代「dict 包 list 包 dict」的巢狀結構，讀回後以 columns() 取得 numpy 欄位做向量化運算。
+    step 為 STEP_NAMES 的索引；ERROR_STEP 列記錄拋出例外的用戶，未完成任何步驟的失敗也不會消失。
+    """
+
+    def __init__(self):
+        for name, typecode, _ in COLUMNS:
+            setattr(self, name, array(typecode))
+
+    def __len__(self):
+        return len(self.step)
+
+    def append(self, user, period, step, status, start_ns, duration_ns):
+        self.user.append(user)
+        self.period.append(period)
+        self.step.append(step)
+        self.status.append(status)
+        self.start_ns.append(start_ns)
+        self.duration_ns.append(duration_ns)
+
+    def add_result(self, result):
+        """將 user_test 的單人結果拆成每個步驟一列"""
+        user = result["user"]
+        period = result.get("period", -1)
+        for s in result["steps"]:
+            self.append(
+                user,
+                period,
+                STEP_IDS[s["step"]],
+                s.get("status", 200 if s["success"] else 0),
+                s.get("start_ns", 0),
+                int(s["time"] * 1_000_000_000)
+            )
+        if "error" in result:
+            self.append(user, period, ERROR_STEP, 0, result.get("error_ns", 0), 0)
+
+    def clear(self):
+        for name, typecode, _ in COLUMNS:
+            setattr(self, name, array(typecode))
+
+    def columns(self):
+        """以 numpy 陣列（零複製）回傳各欄"""
+        return {name: np.frombuffer(getattr(self, name), dtype=dtype) for name, _, dtype in COLUMNS}
+
+    # ---- 向量化彙總 ----
+    def aggregate(self, period=None):
+        """
+        回傳與 summary 中 step_stats 相同格式的統計（average_time / success_rate / percentiles），
+        計數 / 成功數 / 總和各以一次 bincount 完成，百分位以一次排序完成。
+        period 不為 None 時只計入該 period 的列；ERROR_STEP 列不屬於任何步驟，不計入。
+        """
+        cols = self.columns()
+        keep = cols["step"] != ERROR_STEP
+        if period is not None:
+            keep &= cols["period"] == period
+        step = cols["step"][keep].astype(np.intp)
+        dur = cols["duration_ns"][keep]
+        ok = cols["status"][keep] == 200
+        n_steps = len(STEP_NAMES)
+
+        counts = np.bincount(step, minlength=n_steps)
+        successes = np.bincount(step, weights=ok.astype(np.float64), minlength=n_steps)
+        sums = np.bincount(step, weights=dur, minlength=n_steps)
+
+        # 依 (step, duration) 排序後，每個 step 是一段連續且已排序的區間
+        order = np.lexsort((dur, step))
+        sorted_dur = dur[order]
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+
+        stats = {}
+        for i, name in enumerate(STEP_NAMES):
+            count = int(counts[i])
+            segment = sorted_dur[bounds[i]:bounds[i + 1]]
+            percentiles = {}
+            for p in PERCENTILES:
+                rank = max(1, math.ceil(p / 100 * count))
+                percentiles[f"p{p:g}"] = segment[rank - 1] / 1e9 if count else 0.0
+            percentiles["max"] = segment[-1] / 1e9 if count else 0.0
+            stats[name] = {
+                "count": count,
+                "average_time": sums[i] / count / 1e9 if count else 0.0,
+                "success_rate": successes[i] / count if count else 0.0,
+                "percentiles": percentiles
+            }
+        return stats
+
+    # ---- 二進位檔 ----
+    def write_chunk(self, f):
+        """以一個 chunk 寫出目前所有列：header + 各欄原始 bytes"""
+        f.write(CHUNK_HEADER.pack(CHUNK_MAGIC, len(self)))
+        for name, _, _ in COLUMNS:
+            getattr(self, name).tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        store = cls()
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(CHUNK_HEADER.size)
+                if not header:
+                    break
+                magic, rows = CHUNK_HEADER.unpack(header)
+                if magic != CHUNK_MAGIC:
+                    raise ValueError(f"{path} 不是結果記錄檔")
+                for name, _, _ in COLUMNS:
+                    getattr(store, name).fromfile(f, rows)
+        return store
@@ -0,0 +1,129 @@
+# core/retry.py
+import random
+import threading
+import time
+
+
+# ----------------------
+# 限流元件
+# ----------------------
+class TokenBucket:
+    """每秒補充 rate 個 token、最多累積 burst 個，取不到 token 時不等待直接回傳 False"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class RetryBudget:
+    """
+    重試預算：每個原始請求存入 ratio 個 token，每次重試取出 1 個，起始額度為 min_tokens。
+    整個測試期間的重試次數不會超過 ratio × 原始請求數 + min_tokens，避免重試把負載放大成風暴。
+    """
+
+    def __init__(self, ratio, min_tokens=10):
+        self.ratio = ratio
+        self._tokens = float(min_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens += self.ratio
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def refund(self):
+        """退回一個已取出但最後沒有用掉的 token"""
+        with self._lock:
+            self._tokens += 1
+
+
+# ----------------------
+# 重試策略
+# ----------------------
+class RetryPolicy:
+    """
+    客戶端重試策略：指數退避 + jitter，再以重試預算與 token bucket 限制重試量。
+
+    Args:
+        max_attempts (int): 每個請求最多送出幾次（含第一次），1 表示不重試。
+        retry_on (list[int]): 需要重試的 HTTP 狀態碼。
+        base_delay (float): 第一次重試前的退避時間（秒）。
+        multiplier (float): 每次重試退避時間的倍數。
+        max_delay (float): 退避時間上限（秒）。
+        jitter (str): full 為 [0, d] 均勻分布，equal 為 [d/2, d]，none 為固定 d。
+        budget_ratio (float | None): 重試預算，每個原始請求可累積的重試額度，None 表示不限制。
+        budget_min (int): 重試預算的起始額度。
+        rate (float | None): 全程序每秒最多重試次數（token bucket），None 表示不限制。
+        burst (int | None): token bucket 容量，預設與 rate 相同。
+        seed (int | None): jitter 的亂數種子。
+    """
+
+    def __init__(self, max_attempts=1, retry_on=(503,), base_delay=0.1, multiplier=2.0, max_delay=5.0,
+                 jitter="full", budget_ratio=None, budget_min=10, rate=None, burst=None, seed=None):
+        self.max_attempts = max_attempts
+        self.retry_on = frozenset(retry_on)
+        self.base_delay = base_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.budget = RetryBudget(budget_ratio, budget_min) if budget_ratio is not None else None
+        self.bucket = TokenBucket(rate, burst or max(1, rate)) if rate else None
+        self._random = random.Random(seed).random
+
+    @property
+    def enabled(self):
+        return self.max_attempts > 1
+
+    def backoff(self, attempt):
+        """第 attempt 次送出失敗後、下一次重試前的等待秒數"""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        if self.jitter == "full":
+            return delay * self._random()
+        if self.jitter == "equal":
+            return delay / 2 + delay / 2 * self._random()
+        return delay
+
+    def on_request(self):
+        """每個原始請求（不含重試）開始時呼叫，累積重試預算"""
+        if self.budget is not None:
+            self.budget.deposit()
+
+    def next_delay(self, attempt, status):
+        """
+        第 attempt 次送出得到 status 後，決定是否重試。
+
+        Returns:
+            tuple: (delay, reason)。重試時 delay 為退避秒數、reason 為 None；
+            不重試時 delay 為 None，reason 為 done / max_attempts / budget / rate_limited。
+        """
+        if status not in self.retry_on:
+            return None, "done"
+        if attempt >= self.max_attempts:
+            return None, "max_attempts"
+        if self.budget is not None and not self.budget.withdraw():
+            return None, "budget"
+        if self.bucket is not None and not self.bucket.try_acquire():
+            # 被限流擋下的重試沒有送出，預算還回去，不讓限流把預算一併耗掉
+            if self.budget is not None:
+                self.budget.refund()
+            return None, "rate_limited"
+        return self.backoff(attempt), None
@@ -0,0 +1,189 @@
+# core/self_profile.py
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from core.histogram import LatencyHistogram
+
+# 最內層 frame 落在這些模組時，該線程正在等待 I/O 或鎖，不算熱點
+_IDLE_MODULES = ("threading.py", "selectors.py", "queue.py", "socket.py", "ssl.py", "concurrent/futures/thread.py")
+# 本專案的背景寫出 / 服務線程：多數時間阻塞在 SimpleQueue.get 等 C 呼叫，最內層 Python frame 是本專案程式碼，
+# 會被誤判為熱點，依線程名稱排除（其 CPU 仍計入 cpu）
+_BACKGROUND_THREADS = ("result-sink", "log-pipeline", "live-metrics")
+
+_active = None
+
+
+# ----------------------
+# 壓測客戶端自我監測
+# ----------------------
+class ClientProfiler:
+    """
+    在背景線程取樣壓測程序本身的狀態，判斷延遲上升是否來自客戶端：
+      - CPU：本程序每秒的 CPU 時間佔比（1.0 = 吃滿一顆核心，受 GIL 限制時 Python 程式碼約以此為上限）
+      - thread_lag：取樣線程每次睡眠後的超時，包含 OS 排程與重新取得 GIL 的等待
+      - gil_contention：超時達到 GIL 切換間隔（sys.getswitchinterval）的比例，為 GIL 競爭的估計值
+      - loop_lag：async 引擎事件迴圈的延遲，由 loop_lag_probe() 量測
+      - hot_frames：定期抓取所有線程最內層 frame 的取樣 profile（排除等待 I/O 的線程與 _BACKGROUND_THREADS）
+
+    Args:
+        interval (float): 量測 thread_lag 的睡眠間隔（秒）。
+        profile_interval (float): 抓取 frame 的間隔（秒），線程多時抓取成本較高。
+        cpu_threshold (float | None): 平均 CPU 佔比超過此值判定為客戶端瓶頸；None 不以 CPU 判定
+            （wsgi 傳輸在程序內執行伺服器，CPU 必然吃滿）。
+        lag_threshold (float): thread_lag / loop_lag 的 p99 超過此值（秒）判定為客戶端瓶頸。
+        top_frames (int): 報告中列出的熱點 frame 數量。
+    """
+
+    def __init__(self, interval=0.01, profile_interval=0.05, cpu_threshold=0.9, lag_threshold=0.05, top_frames=15):
+        self.interval = interval
+        self.profile_interval = profile_interval
+        self.cpu_threshold = cpu_threshold
+        self.lag_threshold = lag_threshold
+        self.top_frames = top_frames
+
+        self.thread_lag = LatencyHistogram()
+        self.loop_lag = LatencyHistogram()
+        self.gil_waits = 0
+        self.cpu_samples = []
+        self.max_threads = 0
+        self.frames = Counter()
+        self.frame_samples = 0
+        self.idle_samples = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---- 啟停 ----
+    def start(self):
+        global _active
+        self._start_wall = time.monotonic()
+        self._start_cpu = time.process_time()
+        self._thread = threading.Thread(target=self._run, name="client-profiler", daemon=True)
+        self._thread.start()
+        _active = self
+        return self
+
+    def stop(self):
+        global _active
+        if _active is self:
+            _active = None
+        self._stop.set()
+        self._thread.join()
+        self._wall = time.monotonic() - self._start_wall
+        self._cpu = time.process_time() - self._start_cpu
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    # ---- 取樣 ----
+    def _run(self):
+        switch_interval = sys.getswitchinterval()
+        own_id = threading.get_ident()
+        last_cpu_wall, last_cpu = time.monotonic(), time.process_time()
+        next_profile = last_cpu_wall
+
+        while True:
+            t0 = time.monotonic()
+            if self._stop.wait(self.interval):
+                break
+            now = time.monotonic()
+            lag = max(0.0, now - t0 - self.interval)
+            self.thread_lag.record(lag)
+            if lag >= switch_interval:
+                self.gil_waits += 1
+
+            if now - last_cpu_wall >= 1.0:
+                cpu = time.process_time()
+                self.cpu_samples.append((cpu - last_cpu) / (now - last_cpu_wall))
+                last_cpu_wall, last_cpu = now, cpu
+
+            if now >= next_profile:
+                next_profile = now + self.profile_interval
+                self._sample_frames(own_id)
+
+    def _sample_frames(self, own_id):
+        frames = sys._current_frames()
+        self.max_threads = max(self.max_threads, len(frames))
+        background = {t.ident for t in threading.enumerate() if t.name in _BACKGROUND_THREADS}
+        for thread_id, frame in frames.items():
+            if thread_id == own_id or thread_id in background:
+                continue
+            code = frame.f_code
+            self.frame_samples += 1
+            if code.co_filename.endswith(_IDLE_MODULES):
+                self.idle_samples += 1
+                continue
+            self.frames[f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"] += 1
+
+    def record_loop_lag(self, lag):
+        self.loop_lag.record(max(0.0, lag))
+
+    # ---- 報告 ----
+    def report(self):
+        cpu_average = self._cpu / self._wall if self._wall > 0 else 0.0
+        busy = self.frame_samples - self.idle_samples
+        report = {
+            "pid": os.getpid(),
+            "duration": self._wall,
+            "cpu": {
+                "average": cpu_average,
+                "max": max(self.cpu_samples, default=cpu_average),
+                "cpu_count": os.cpu_count()
+            },
+            "thread_lag": {"average": self.thread_lag.mean, **self.thread_lag.percentiles()},
+            "gil_contention": self.gil_waits / self.thread_lag.total_count if self.thread_lag.total_count else 0.0,
+            "max_threads": self.max_threads,
+            "busy_frame_ratio": busy / self.frame_samples if self.frame_samples else 0.0,
+            "hot_frames": [
+                {"frame": frame, "share": count / busy}
+                for frame, count in self.frames.most_common(self.top_frames)
+            ]
+        }
+        if self.loop_lag.total_count:
+            report["loop_lag"] = {"average": self.loop_lag.mean, **self.loop_lag.percentiles()}
+
+        reasons = []
+        if self.cpu_threshold is not None and cpu_average >= self.cpu_threshold:
+            reasons.append(f"client CPU {cpu_average:.0%} of one core >= {self.cpu_threshold:.0%}")
+        if report["thread_lag"]["p99"] >= self.lag_threshold:
+            reasons.append(f"thread scheduling lag p99 {report['thread_lag']['p99'] * 1000:.1f}ms "
+                           f">= {self.lag_threshold * 1000:.0f}ms")
+        if "loop_lag" in report and report["loop_lag"]["p99"] >= self.lag_threshold:
+            reasons.append(f"event loop lag p99 {report['loop_lag']['p99'] * 1000:.1f}ms "
+                           f">= {self.lag_threshold * 1000:.0f}ms")
+        report["client_bottleneck"] = bool(reasons)
+        report["reasons"] = reasons
+        return report
+
+
+def profiler_config(config, transport="http"):
+    """
+    ClientProfiler 參數；wsgi 傳輸在程序內執行伺服器，CPU 吃滿是預期行為，
+    不以 CPU 判定客戶端瓶頸（否則報表預設會排除所有 wsgi run），只看排程與事件迴圈延遲
+    """
+    return {**config, "cpu_threshold": None} if transport == "wsgi" else config
+
+
+# ----------------------
+# 事件迴圈延遲
+# ----------------------
+async def loop_lag_probe(profiler):
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(profiler.interval)
+        profiler.record_loop_lag(loop.time() - t0 - profiler.interval)
+
+
+def start_loop_probe():
+    """有啟用中的 ClientProfiler 時，在目前的事件迴圈上量測延遲，回傳 task（呼叫端結束時取消）"""
+    if _active is None:
+        return None
+    return asyncio.create_task(loop_lag_probe(_active))
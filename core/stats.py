@@ -0,0 +1,204 @@
+# core/stats.py
+from core.histogram import LatencyHistogram
+from core.timing import PHASES
+
+STEP_NAMES = ["landing_page", "start_form", "submit_form"]
+_STEP_COUNTERS = ("count", "success", "time_sum", "timed", "bytes_sent", "bytes_received", "attempts", "retry_denied")
+
+
+def _new_step():
+    return {
+        "count": 0, "success": 0, "time_sum": 0.0, "histogram": LatencyHistogram(),
+        # 含重試的實際送出次數，以及重試被預算 / 限流擋下的次數
+        "attempts": 0, "retry_denied": 0,
+        # 每一次送出各自的延遲（含重試中失敗的那幾次，不含退避等待）
+        "attempt_histogram": LatencyHistogram(),
+        # 分階段計時（有 connect_ns 等欄位的步驟才計入 timed）
+        "timed": 0, "bytes_sent": 0, "bytes_received": 0,
+        "phase_ns": {phase: 0 for phase in PHASES},
+        "phase_histograms": {phase: LatencyHistogram() for phase in PHASES}
+    }
+
+
+# ----------------------
+# 可合併的統計累加器
+# ----------------------
+class RunStats:
+    """
+    逐筆累加用戶結果的統計，只保留計數、總和與延遲直方圖，
+    因此可以跨線程 / 跨程序合併，記憶體也不隨請求數成長。
+    """
+
+    def __init__(self, total_key="total_time"):
+        self.total_key = total_key
+        self.total = 0
+        self.success_count = 0
+        self.time_sum = 0.0
+        self.histogram = LatencyHistogram()
+        self.steps = {name: _new_step() for name in STEP_NAMES}
+        # open model 的開始延遲（預定 vs 實際）
+        self.lag_histogram = LatencyHistogram()
+
+    def add(self, result):
+        self.total += 1
+        if result["success"]:
+            self.success_count += 1
+        total_time = result.get(self.total_key, 0.0)
+        self.time_sum += total_time
+        self.histogram.record(total_time)
+        if "start_lag" in result:
+            self.lag_histogram.record(result["start_lag"])
+
+        for s in result["steps"]:
+            step = self.steps.get(s["step"])
+            if step is None:
+                step = self.steps[s["step"]] = _new_step()
+            step["count"] += 1
+            step["success"] += 1 if s["success"] else 0
+            step["time_sum"] += s["time"]
+            step["histogram"].record(s["time"])
+            step["attempts"] += s.get("attempts", 1)
+            for t in s.get("attempt_times", (s["time"],)):
+                step["attempt_histogram"].record(t)
+            if "retry_denied" in s:
+                step["retry_denied"] += 1
+            if "ttfb_ns" in s:
+                step["timed"] += 1
+                step["bytes_sent"] += s["bytes_sent"]
+                step["bytes_received"] += s["bytes_received"]
+                for phase in PHASES:
+                    ns = s[f"{phase}_ns"]
+                    step["phase_ns"][phase] += ns
+                    step["phase_histograms"][phase].record(ns / 1e9)
+
+    def merge(self, other):
+        self.total += other.total
+        self.success_count += other.success_count
+        self.time_sum += other.time_sum
+        self.histogram.merge(other.histogram)
+        self.lag_histogram.merge(other.lag_histogram)
+        for name, other_step in other.steps.items():
+            step = self.steps.get(name)
+            if step is None:
+                step = self.steps[name] = _new_step()
+            for key in _STEP_COUNTERS:
+                step[key] += other_step[key]
+            step["histogram"].merge(other_step["histogram"])
+            step["attempt_histogram"].merge(other_step["attempt_histogram"])
+            for phase in PHASES:
+                step["phase_ns"][phase] += other_step["phase_ns"][phase]
+                step["phase_histograms"][phase].merge(other_step["phase_histograms"][phase])
+        return self
+
+    # ---- 統計結果 ----
+    @property
+    def success_rate(self):
+        return self.success_count / self.total if self.total else 0.0
+
+    @property
+    def average_time(self):
+        return self.time_sum / self.total if self.total else 0.0
+
+    def percentiles(self):
+        return self.histogram.percentiles()
+
+    def lag_stats(self):
+        """open model 的開始延遲統計，沒有排程資料時回傳 None"""
+        if self.lag_histogram.total_count == 0:
+            return None
+        return {
+            "average": self.lag_histogram.mean,
+            "percentiles": self.lag_histogram.percentiles()
+        }
+
+    def load_stats(self, duration=None):
+        """
+        區分送出的負載與有效產出：
+          requests：用戶流程中的請求數（不含重試）
+          attempts：實際送出的請求數（offered load，含重試）
+          amplification：attempts / requests，重試造成的負載放大倍數
+          goodput_ratio：成功請求佔實際送出請求的比例
+        有 duration（秒）時另外換算每秒的 offered load 與 goodput。
+        """
+        requests = sum(step["count"] for step in self.steps.values())
+        attempts = sum(step["attempts"] for step in self.steps.values())
+        successful = sum(step["success"] for step in self.steps.values())
+        load = {
+            "requests": requests,
+            "attempts": attempts,
+            "successful_requests": successful,
+            "retry_denied": sum(step["retry_denied"] for step in self.steps.values()),
+            "amplification": attempts / requests if requests else 0.0,
+            "goodput_ratio": successful / attempts if attempts else 0.0
+        }
+        if duration:
+            load.update({
+                "duration": duration,
+                "offered_load_rps": attempts / duration,
+                "goodput_rps": successful / duration,
+                "goodput_users_per_sec": self.success_count / duration
+            })
+        return load
+
+    def step_stats(self):
+        stats = {}
+        for name, step in self.steps.items():
+            stats[name] = {
+                "average_time": step["time_sum"] / step["count"] if step["count"] else 0.0,
+                "success_rate": step["success"] / step["count"] if step["count"] else 0.0,
+                "percentiles": step["histogram"].percentiles(),
+                # 完整直方圖（只含非零桶），報表由此畫 CDF
+                "histogram": step["histogram"].to_dict(),
+                "attempts": step["attempts"],
+                "amplification": step["attempts"] / step["count"] if step["count"] else 0.0
+            }
+            if step["attempts"] > step["count"]:
+                # 有重試時 percentiles 含退避等待，這裡是每一次送出本身的延遲分布
+                stats[name]["attempt_percentiles"] = step["attempt_histogram"].percentiles()
+            if step["timed"]:
+                stats[name]["phases"] = {
+                    phase: {"average": step["phase_ns"][phase] / step["timed"] / 1e9,
+                            **step["phase_histograms"][phase].percentiles()}
+                    for phase in PHASES
+                }
+                stats[name]["bytes_sent"] = step["bytes_sent"]
+                stats[name]["bytes_received"] = step["bytes_received"]
+                stats[name]["average_bytes_received"] = step["bytes_received"] / step["timed"]
+        return stats
+
+    # ---- 序列化（跨程序傳遞用） ----
+    def to_dict(self):
+        return {
+            "total_key": self.total_key,
+            "total": self.total,
+            "success_count": self.success_count,
+            "time_sum": self.time_sum,
+            "histogram": self.histogram.to_dict(),
+            "lag_histogram": self.lag_histogram.to_dict(),
+            "steps": {
+                name: {**{k: step[k] for k in _STEP_COUNTERS},
+                       "phase_ns": dict(step["phase_ns"]),
+                       "histogram": step["histogram"].to_dict(),
+                       "attempt_histogram": step["attempt_histogram"].to_dict(),
+                       "phase_histograms": {p: h.to_dict() for p, h in step["phase_histograms"].items()}}
+                for name, step in self.steps.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls(total_key=d.get("total_key", "total_time"))
+        stats.total = d["total"]
+        stats.success_count = d["success_count"]
+        stats.time_sum = d["time_sum"]
+        stats.histogram = LatencyHistogram.from_dict(d["histogram"])
+        stats.lag_histogram = LatencyHistogram.from_dict(d["lag_histogram"])
+        stats.steps = {
+            name: {**{k: step[k] for k in _STEP_COUNTERS},
+                   "phase_ns": dict(step["phase_ns"]),
+                   "histogram": LatencyHistogram.from_dict(step["histogram"]),
+                   "attempt_histogram": LatencyHistogram.from_dict(step["attempt_histogram"]),
+                   "phase_histograms": {p: LatencyHistogram.from_dict(h) for p, h in step["phase_histograms"].items()}}
+            for name, step in d["steps"].items()
+        }
+        return stats
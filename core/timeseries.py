@@ -0,0 +1,223 @@
+# core/timeseries.py
+import json
+import math
+import threading
+import time
+from pathlib import Path
+
+from core.histogram import LatencyHistogram
+from core.result_sink import ResultSink
+
+QUANTILES = ["p50", "p90", "p99", "max"]
+# 側檔每個步驟一列的欄位順序
+FIELDS = ["count", "errors", *QUANTILES, "latency_bins"]
+# 熱圖的延遲分箱：每個 2 倍區間切 4 箱（約 19% 寬），第 b 箱下界為 2^(b/4) µs
+HEATMAP_BINS_PER_OCTAVE = 4
+
+
+def latency_bin(seconds):
+    return int(HEATMAP_BINS_PER_OCTAVE * math.log2(max(seconds * 1_000_000, 1.0)))
+
+
+def sidecar_path(summary_file):
+    """summary 對應的時間序列側檔：<summary 檔名>_timeseries.jsonl"""
+    summary_file = Path(summary_file)
+    return summary_file.with_name(f"{summary_file.stem}_timeseries.jsonl")
+
+
+# ----------------------
+# 滾動時間序列
+# ----------------------
+class TimeSeries:
+    """
+    每 resolution 秒一個 bucket，記錄各步驟的完成數、失敗數與延遲分位數。
+
+    步驟依完成時間（start_ns + time）歸入 bucket。最近 window 秒的 bucket 放在環狀緩衝中，
+    每個 bucket 每個步驟一個低精度直方圖（significant_digits=1，約 4 KB）；
+    超出 window 的 bucket 收斂成 count / errors / p50 / p90 / p99 / max，
+    以及熱圖用的粗分箱計數 latency_bins（[[箱, 數量], ...]，見 latency_bin），
+    由 ResultSink 的背景線程逐行寫入 path（JSON Lines，第一行為欄位說明），
+    記憶體只與 window 大小有關，與測試時間長度無關。
+
+    用戶結果在整個流程結束後才回報，window 需大於單一用戶最長的執行時間；
+    落在已收斂 bucket 的樣本不再計入，只累計 late_samples。
+
+    Args:
+        path (Path): 側檔路徑。
+        resolution (float): bucket 寬度（秒）。
+        window (float): 仍可接收結果的時間範圍（秒）。
+        start (float | None): 時間軸起點（time.time()），預設為建立時間。
+    """
+
+    def __init__(self, path, resolution=1.0, window=120, start=None, significant_digits=1):
+        self.path = Path(path)
+        self.start = time.time() if start is None else start
+        self.resolution = resolution
+        self.significant_digits = significant_digits
+        self.late_samples = 0
+        self.exceptions = 0  # 中途拋出例外的用戶數（依回報時間歸入 bucket）
+        self.empty_buckets = 0  # 沒有任何步驟完成的 bucket 數（停頓秒數）
+        self.overview = {}  # 步驟 -> 全程的 count / errors / 最差 p99 與其時間
+
+        self._size = max(1, math.ceil(window / resolution))
+        self._ring = [{} for _ in range(self._size)]
+        self._ring_exceptions = [0] * self._size
+        self._newest = -1  # 已建立的最新 bucket
+        self._closed = 0   # 小於此編號的 bucket 已收斂
+        self._lock = threading.Lock()
+
+        self._sink = ResultSink(self.path)
+        self._sink.write({"start": self.start, "resolution": resolution,
+                          "bins_per_octave": HEATMAP_BINS_PER_OCTAVE, "fields": FIELDS})
+
+    # ---- 記錄 ----
+    def add(self, result):
+        with self._lock:
+            for s in result["steps"]:
+                end = s["start_ns"] / 1e9 + s["time"]
+                self._record(s["step"], end, s["success"], s["time"])
+            if "error" in result:
+                i = self._bucket(time.time())
+                if i < self._closed:
+                    self.late_samples += 1
+                else:
+                    if i > self._newest:
+                        self._advance(i)
+                    self._ring_exceptions[i % self._size] += 1
+
+    def _bucket(self, t):
+        return int((t - self.start) // self.resolution)
+
+    def _record(self, step, t, success, latency):
+        i = self._bucket(t)
+        if i < self._closed:
+            self.late_samples += 1
+            return
+        if i > self._newest:
+            self._advance(i)
+        entry = self._ring[i % self._size].get(step)
+        if entry is None:
+            entry = self._ring[i % self._size][step] = [0, 0, LatencyHistogram(self.significant_digits)]
+        entry[0] += 1
+        if not success:
+            entry[1] += 1
+        entry[2].record(latency)
+
+    def _advance(self, i):
+        # 新 bucket 會覆蓋環狀緩衝中 i - size 以前的 bucket，先收斂它們
+        while self._closed <= i - self._size:
+            self._close()
+        for k in range(max(self._newest + 1, self._closed), i + 1):
+            self._ring[k % self._size] = {}
+            self._ring_exceptions[k % self._size] = 0
+        self._newest = i
+
+    def _close(self):
+        k = self._closed
+        slot = self._ring[k % self._size] if k <= self._newest else {}
+        line = {"t": k}
+        exceptions = self._ring_exceptions[k % self._size] if k <= self._newest else 0
+        if exceptions:
+            line["exceptions"] = exceptions
+            self.exceptions += exceptions
+        if slot:
+            line["steps"] = {}
+            for step, (count, errors, histogram) in slot.items():
+                quantiles = histogram.percentiles()
+                line["steps"][step] = [count, errors, *(quantiles[q] for q in QUANTILES), _coarse_bins(histogram)]
+                self._update_overview(step, k, count, errors, quantiles["p99"])
+        else:
+            self.empty_buckets += 1
+        self._sink.write(line)
+        self._closed += 1
+
+    def _update_overview(self, step, k, count, errors, p99):
+        o = self.overview.get(step)
+        if o is None:
+            o = self.overview[step] = {"count": 0, "errors": 0, "worst_p99": 0.0, "worst_p99_at": None}
+        o["count"] += count
+        o["errors"] += errors
+        if p99 > o["worst_p99"]:
+            o["worst_p99"] = p99
+            o["worst_p99_at"] = k * self.resolution
+
+    # ---- 輸出 ----
+    def close(self):
+        """收斂所有 bucket 並關閉側檔，回傳寫入 summary 的概要（完整欄位在側檔）"""
+        with self._lock:
+            while self._closed <= self._newest:
+                self._close()
+        self._sink.close()
+        return {
+            "file": self.path.name,
+            "start": self.start,
+            "resolution": self.resolution,
+            "buckets": self._closed,
+            "empty_buckets": self.empty_buckets,
+            "late_samples": self.late_samples,
+            "exceptions": self.exceptions,
+            "steps": self.overview
+        }
+
+
+def _coarse_bins(histogram):
+    """將 bucket 的直方圖併成 HEATMAP_BINS_PER_OCTAVE 的對數分箱"""
+    bins = {}
+    for value, c in histogram.buckets():
+        b = latency_bin(value)
+        bins[b] = bins.get(b, 0) + c
+    return [[b, c] for b, c in sorted(bins.items())]
+
+
+# ----------------------
+# 讀取側檔
+# ----------------------
+def read_timeseries(path, heatmap_columns=None):
+    """
+    讀回 TimeSeries 寫出的側檔，轉成逐 bucket 的欄位：
+      {"start", "resolution", "bins_per_octave", "buckets", "exceptions": [...],
+       "steps": {步驟: {"count": [...], "errors": [...], "p50": [...], ..., "heatmap": [...]}}}
+    沒有樣本的 bucket 分位數為 None。heatmap 為每欄一個 {箱: 數量}，
+    有 heatmap_columns 時相鄰 bucket 相加到最多該欄數，記憶體不隨測試時間成長。
+    """
+    with open(path, "rb") as f:
+        buckets = sum(1 for _ in f) - 1
+    factor = max(1, -(-buckets // heatmap_columns)) if heatmap_columns else 1
+    rows = -(-buckets // factor)
+
+    steps = {}
+    exceptions = []
+    with open(path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        for k, line in enumerate(f):
+            record = json.loads(line)
+            exceptions.append(record.get("exceptions", 0))
+            present = record.get("steps", {})
+            for step in present.keys() - steps.keys():
+                # 中途才出現的步驟，前面的 bucket 補 0 / None
+                steps[step] = {"count": [0] * k, "errors": [0] * k, **{q: [None] * k for q in QUANTILES},
+                               "heatmap": [{} for _ in range(rows)]}
+            for step, column in steps.items():
+                values = present.get(step)
+                if values is None:
+                    column["count"].append(0)
+                    column["errors"].append(0)
+                    for q in QUANTILES:
+                        column[q].append(None)
+                    continue
+                row = dict(zip(header["fields"], values))
+                for name in ("count", "errors", *QUANTILES):
+                    column[name].append(row[name])
+                cell = column["heatmap"][k // factor]
+                for b, c in row["latency_bins"]:
+                    cell[b] = cell.get(b, 0) + c
+
+    return {
+        "start": header["start"],
+        "resolution": header["resolution"],
+        "bins_per_octave": header["bins_per_octave"],
+        "buckets": buckets,
+        "heatmap_factor": factor,
+        "exceptions": exceptions,
+        "steps": steps
+    }
@@ -0,0 +1,32 @@
+# core/timing.py
+import time
+
+# 請求各階段，依序相接，加總等於該請求的總耗時
+#   connect：取得連線（排隊等待連線池 + 建立 TCP 連線，重用連線時接近 0）
+#   send：送出 request header 與 body
+#   ttfb：送出後等到 response header，主要是伺服器處理時間
+#   read：讀取 response body，與回應大小及頻寬有關
+PHASES = ["connect", "send", "ttfb", "read"]
+
+now_ns = time.perf_counter_ns
+
+
+def phase_timing(t0, connected, sent, headers, end, bytes_sent, bytes_received):
+    """
+    由各時間點（perf_counter_ns）算出各階段耗時，缺少的時間點視為與前一個時間點相同。
+
+    Returns:
+        dict: connect_ns / send_ns / ttfb_ns / read_ns 與 bytes_sent / bytes_received。
+    """
+    connected = max(connected or t0, t0)
+    sent = max(sent or connected, connected)
+    headers = max(headers or sent, sent)
+    end = max(end, headers)
+    return {
+        "connect_ns": connected - t0,
+        "send_ns": sent - connected,
+        "ttfb_ns": headers - sent,
+        "read_ns": end - headers,
+        "bytes_sent": bytes_sent,
+        "bytes_received": bytes_received
+    }
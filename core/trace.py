@@ -0,0 +1,55 @@
+# core/trace.py
+import atexit
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from core.result_sink import ResultSink
+
+TRACE_DIR = Path("results/traces")
+
+_recorder = None
+_lock = threading.Lock()
+
+
+# ----------------------
+# 流量紀錄
+# ----------------------
+def start_recording(path=None):
+    """
+    開始記錄本程序送出的每個請求，每行一筆 JSON：
+      ts：送出時間（epoch 秒）、method、route（路徑，不含主機，重播時可指向其他伺服器）、
+      status、latency（秒）、body（POST 的 JSON body，GET 為 null）
+    寫入由 ResultSink 的背景線程批次完成，記錄順序為完成順序，重播時再依 ts 重新排序。
+    """
+    global _recorder
+    with _lock:
+        if _recorder is None:
+            if path is None:
+                TRACE_DIR.mkdir(parents=True, exist_ok=True)
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                path = TRACE_DIR / f"trace_{timestamp}_{os.getpid()}.jsonl"
+            _recorder = ResultSink(Path(path))
+            atexit.register(stop_recording)
+    return _recorder.path
+
+
+def stop_recording():
+    global _recorder
+    with _lock:
+        if _recorder is not None:
+            _recorder.close()
+            print(f"Trace: {_recorder.path} ({_recorder.count} requests)")
+            _recorder = None
+
+
+def record_request(ts, method, url, status, latency, body=None):
+    """由 timed_request 呼叫，首次呼叫時才開啟 trace 檔"""
+    if _recorder is None:
+        start_recording()
+    parts = urlsplit(url)
+    route = f"{parts.path}?{parts.query}" if parts.query else parts.path
+    _recorder.write({"ts": ts, "method": method, "route": route, "status": status,
+                     "latency": latency, "body": body})
@@ -0,0 +1,185 @@
+# test_tool/distributed.py
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from datetime import datetime
+
+from core.api_test_core import use_payload_shard
+from core.stats import RunStats
+from test_tool.high_concurrency import NUM_USERS_LIST, ENGINE, run_users, build_summary, write_summary
+
+# ----------------------
+# 讀取分散式設定
+# ----------------------
+DIST_CONFIG_PATH = Path("config/distributed.json")
+with open(DIST_CONFIG_PATH, "r", encoding="utf-8") as f:
+    dist_config = json.load(f)
+
+HOST = dist_config.get("host", "127.0.0.1")
+PORT = dist_config.get("port", 5601)
+LOCAL_WORKERS = dist_config.get("local_workers", os.cpu_count() or 1)
+REMOTE_WORKERS = dist_config.get("remote_workers", 0)
+
+# ----------------------
+# 訊息協定：一行一個 JSON
+# ----------------------
+# worker -> coordinator: hello / ready / result
+# coordinator -> worker: assign / start / stop
+def send_msg(stream, msg):
+    stream.write(json.dumps(msg) + "\n")
+    stream.flush()
+
+
+def recv_msg(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("連線已中斷")
+    return json.loads(line)
+
+
+def split_users(num_users, num_workers):
+    """
+    將用戶平均分給每個 worker，回傳 [(offset, count), ...]
+    """
+    base, extra = divmod(num_users, num_workers)
+    slices = []
+    offset = 0
+    for w in range(num_workers):
+        count = base + (1 if w < extra else 0)
+        slices.append((offset, count))
+        offset += count
+    return slices
+
+
+# ----------------------
+# Worker
+# ----------------------
+def run_worker(host, port):
+    sock = socket.create_connection((host, port))
+    stream = sock.makefile("rw", encoding="utf-8")
+    send_msg(stream, {"type": "hello", "host": socket.gethostname(), "pid": os.getpid(), "engine": ENGINE})
+
+    shard = None
+    try:
+        while True:
+            msg = recv_msg(stream)
+            if msg["type"] == "stop":
+                break
+            if msg["type"] != "assign":
+                continue
+
+            offset, count = msg["offset"], msg["count"]
+            if shard != (msg["worker_id"], msg["num_workers"]):
+                # sharded 模式下各 worker 讀取假資料檔中不重疊的區段
+                shard = (msg["worker_id"], msg["num_workers"])
+                use_payload_shard(*shard)
+            indices = range(offset + 1, offset + count + 1)
+
+            # 起跑柵欄：回報就緒後等待 coordinator 統一放行
+            send_msg(stream, {"type": "ready"})
+            start = recv_msg(stream)
+            if start["type"] != "start":
+                raise RuntimeError(f"預期 start 訊息，收到 {start['type']}")
+
+            stats = RunStats()
+            if count:
+                # current_users 使用整體人數，讓伺服器成功率模型看到的是總負載
+                run_users(indices, msg["num_users"], stats.add)
+            send_msg(stream, {"type": "result", "stats": stats.to_dict()})
+    finally:
+        stream.close()
+        sock.close()
+
+
+# ----------------------
+# Coordinator
+# ----------------------
+def spawn_local_workers(num_workers, port):
+    connect_host = "127.0.0.1" if HOST in ("0.0.0.0", "") else HOST
+    return [
+        subprocess.Popen([sys.executable, "-m", "test_tool.distributed", "--worker",
+                          "--host", connect_host, "--port", str(port)])
+        for _ in range(num_workers)
+    ]
+
+
+def run_coordinator(local_workers=LOCAL_WORKERS, remote_workers=REMOTE_WORKERS):
+    expected = local_workers + remote_workers
+    if expected < 1:
+        raise ValueError("至少需要一個 worker")
+
+    server = socket.create_server((HOST, PORT))
+    server.listen(expected)
+    procs = spawn_local_workers(local_workers, PORT)
+    print(f"Coordinator listening on {HOST}:{PORT}, waiting for {expected} workers "
+          f"({local_workers} local, {remote_workers} remote)")
+
+    workers = []
+    try:
+        while len(workers) < expected:
+            conn, addr = server.accept()
+            stream = conn.makefile("rw", encoding="utf-8")
+            hello = recv_msg(stream)
+            workers.append((conn, stream))
+            print(f"Worker {len(workers)}/{expected} joined: {hello['host']} pid={hello['pid']} engine={hello['engine']}")
+
+        for NUM_USERS in NUM_USERS_LIST:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+            for worker_id, ((_, stream), (offset, count)) in enumerate(zip(workers, split_users(NUM_USERS, len(workers)))):
+                send_msg(stream, {"type": "assign", "num_users": NUM_USERS, "offset": offset, "count": count,
+                                  "worker_id": worker_id, "num_workers": len(workers)})
+
+            # 起跑柵欄：全部 ready 後才同時送出 start
+            for _, stream in workers:
+                if recv_msg(stream)["type"] != "ready":
+                    raise RuntimeError("worker 未回報 ready")
+            t0 = time.monotonic()
+            for _, stream in workers:
+                send_msg(stream, {"type": "start"})
+
+            # 合併各 worker 的統計
+            stats = RunStats()
+            for _, stream in workers:
+                msg = recv_msg(stream)
+                stats.merge(RunStats.from_dict(msg["stats"]))
+
+            summary = build_summary(NUM_USERS, stats, time.monotonic() - t0)
+            summary["workers"] = len(workers)
+            summary_file = write_summary(NUM_USERS, timestamp, summary)
+
+            print(f"----------------- Distributed test for {NUM_USERS} users finished ({len(workers)} workers) -----------------")
+            print(f"Summary: {summary_file}\n")
+
+        for _, stream in workers:
+            send_msg(stream, {"type": "stop"})
+    finally:
+        for conn, stream in workers:
+            stream.close()
+            conn.close()
+        server.close()
+        for p in procs:
+            p.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed high concurrency test")
+    parser.add_argument("--worker", action="store_true",
+                        help="Run as worker and connect to a coordinator")
+    parser.add_argument("--host", default=HOST, help="Coordinator host (worker mode)")
+    parser.add_argument("--port", type=int, default=PORT, help="Coordinator port (worker mode)")
+    parser.add_argument("--local_workers", type=int, default=LOCAL_WORKERS,
+                        help="Number of local worker processes to spawn")
+    parser.add_argument("--remote_workers", type=int, default=REMOTE_WORKERS,
+                        help="Number of remote workers to wait for")
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.host, args.port)
+    else:
+        run_coordinator(args.local_workers, args.remote_workers)
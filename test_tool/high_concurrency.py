@@ -2,20 +2,18 @@
 import os
 import json
 import time
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from core.api_test_core import visit_landing_page, start_form, submit_form
-import logging
-
-# ----------------------
-# 讀取假資料
-# ----------------------
-FAKE_DATA_PATH = Path("fake_data/fake_form_data.json")
-with open(FAKE_DATA_PATH, "r", encoding="utf-8") as f:
-    fake_data_list = json.load(f)
-
-data = fake_data_list[0]
+from core.api_test_core import visit_landing_page, start_form, submit_form, user_session, next_payload, CONNECTION_MODE, PAYLOAD_MODE, TRANSPORT, RETRY_POLICY, get_wsgi_app, wsgi_route_profile
+from core.stats import RunStats
+from core.capacity import search_capacity
+from core.self_profile import ClientProfiler, profiler_config
+from core.result_sink import open_sink
+from core.log_pipeline import LogPipeline
+from core.live_metrics import LiveMetrics, start_metrics_server
+from core.async_engine import async_visit_landing_page, async_start_form, async_submit_form, run_async_users
 
 # ----------------------
 # 讀取高併發設定
@@ -25,6 +23,14 @@ with open(HC_CONFIG_PATH, "r", encoding="utf-8") as f:
     hc_config = json.load(f)
 
 NUM_USERS_LIST = hc_config.get("num_users", [10, 20, 30, 40, 50])
+ENGINE = hc_config.get("engine", "thread")  # thread | async
+ASYNC_CONNECTION_LIMIT = hc_config.get("async_connection_limit", 0)  # 0 = 不限制
+RAW_LOG = hc_config.get("raw_log")  # None 不保存 | jsonl | binary：每位用戶的原始結果
+METRICS_PORT = hc_config.get("metrics_port")  # None 不啟動即時指標端點
+MODE = hc_config.get("mode", "levels")  # levels：依序跑 num_users | capacity：自動搜尋容量
+CAPACITY_SEARCH = hc_config.get("capacity_search", {"min_success_rate": 0.99})
+SELF_PROFILE = hc_config.get("self_profile")  # None 不監測 | ClientProfiler 參數：監測壓測客戶端本身是否成為瓶頸
+LOG_PIPELINE = hc_config.get("log", {})  # LogPipeline 參數：flush_interval / sample_rate（逐用戶 log 的保留比例）
 
 # ----------------------
 # 設定log存放位置
@@ -33,107 +39,240 @@ LOG_DIR = Path("results/logs/high_concurrency")
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 SUMMARY_DIR = Path("results/summary/high_concurrency")
 SUMMARY_DIR.mkdir(parents=True, exist_ok=True)
+CAPACITY_DIR = Path("results/summary/capacity")
 
 # ----------------------
 # 單一用戶測試封裝
 # ----------------------
 def user_test(index, total_users):
     result = {"user": index, "steps": [], "success": True, "total_time": 0.0}
-    start_time = time.time()
+    start_time = time.perf_counter()
+    data = next_payload()
     try:
-        for step_name, func in [
-            ("landing_page", visit_landing_page),
-            ("start_form", start_form),
-            ("submit_form", lambda: submit_form({**data, "current_users": total_users}))
+        with user_session() as session:
+            for step_name, func in [
+                ("landing_page", lambda: visit_landing_page(session)),
+                ("start_form", lambda: start_form(session)),
+                ("submit_form", lambda: submit_form({**data, "current_users": total_users}, session))
+            ]:
+                step_start_ns = time.time_ns()
+                r, elapsed, timing = func()
+
+                # 成功條件：HTTP 200 + API message 正常
+                step_success = (r.status_code == 200)
+                result["steps"].append({
+                    "step": step_name,
+                    "success": step_success,
+                    "time": elapsed,
+                    "status": r.status_code,
+                    "start_ns": step_start_ns,
+                    **timing
+                })
+                if not step_success:
+                    result["success"] = False
+
+        result["total_time"] = time.perf_counter() - start_time
+
+    except Exception as e:
+        result["success"] = False
+        result["error"] = str(e)
+        result["error_ns"] = time.time_ns()
+
+    return result
+
+
+async def async_user_test(session, index, total_users):
+    result = {"user": index, "steps": [], "success": True, "total_time": 0.0}
+    start_time = time.perf_counter()
+    data = next_payload()
+    try:
+        for step_name, coro_func in [
+            ("landing_page", lambda: async_visit_landing_page(session)),
+            ("start_form", lambda: async_start_form(session)),
+            ("submit_form", lambda: async_submit_form(session, {**data, "current_users": total_users}))
         ]:
-            r, elapsed = func()
+            step_start_ns = time.time_ns()
+            r, elapsed, timing = await coro_func()
 
-            # 成功條件：HTTP 200 + API message 正常
-            step_success = (r.status_code == 200)
+            step_success = (r.status == 200)
             result["steps"].append({
                 "step": step_name,
                 "success": step_success,
-                "time": elapsed
+                "time": elapsed,
+                "status": r.status,
+                "start_ns": step_start_ns,
+                **timing
             })
             if not step_success:
                 result["success"] = False
 
-        result["total_time"] = time.time() - start_time
+        result["total_time"] = time.perf_counter() - start_time
 
     except Exception as e:
         result["success"] = False
         result["error"] = str(e)
+        result["error_ns"] = time.time_ns()
 
     return result
 
 
 # ----------------------
-# 高併發執行
+# 執行一批用戶
 # ----------------------
-def run_high_concurrency():
-    for NUM_USERS in NUM_USERS_LIST:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        log_file = LOG_DIR / f"hc_{NUM_USERS}u_{timestamp}.log"
-
-        # 設定 logger
-        logger = logging.getLogger(f"hc_{NUM_USERS}")
-        logger.setLevel(logging.INFO)
-        logger.handlers.clear()  # 避免重複
-        fh = logging.FileHandler(log_file, mode='w', encoding='utf-8')
-        formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(message)s')
-        fh.setFormatter(formatter)
-        logger.addHandler(fh)
-
-        logger.info(f"Start high concurrency test: {NUM_USERS} users")
-
-        results = []
-        with ThreadPoolExecutor(max_workers=NUM_USERS) as executor:
-            futures = [executor.submit(user_test, i + 1, NUM_USERS) for i in range(NUM_USERS)]
+def run_users(indices, total_users, on_result):
+    """
+    以設定的引擎 (thread / async) 執行一批用戶，每位用戶完成時呼叫 on_result。
+    total_users 為整體併發人數，分散式模式下可能大於 len(indices)。
+    """
+    if ENGINE == "async":
+        if TRANSPORT == "wsgi":
+            raise ValueError("wsgi 傳輸只支援 thread 引擎")
+        run_async_users(
+            async_user_test,
+            [(i, total_users) for i in indices],
+            on_result=on_result,
+            connection_limit=ASYNC_CONNECTION_LIMIT
+        )
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, len(indices))) as executor:
+            futures = [executor.submit(user_test, i, total_users) for i in indices]
             for future in as_completed(futures):
-                res = future.result()
-                results.append(res)
-                logger.info(
-                    f"User {res['user']} finished, success: {res['success']}, total_time: {res['total_time']:.3f}s"
-                )
+                on_result(future.result())
+
+
+def build_summary(NUM_USERS, stats, duration=None):
+    """將 RunStats 轉成 summary JSON 格式，duration 為該等級的執行秒數（用於換算 offered load / goodput）"""
+    return {
+        "NUM_USERS": NUM_USERS,
+        "total_users": stats.total,
+        "success_count": stats.success_count,
+        "fail_count": stats.total - stats.success_count,
+        "success_rate": stats.success_rate,
+        "average_time": stats.average_time,
+        "percentiles": stats.percentiles(),
+        "step_stats": stats.step_stats(),
+        "load": stats.load_stats(duration),
+        "config": {"engine": ENGINE, "connection_mode": CONNECTION_MODE, "payload_mode": PAYLOAD_MODE,
+                   "transport": TRANSPORT, "retry_policy": RETRY_POLICY}
+    }
+
+
+def write_summary(NUM_USERS, timestamp, summary):
+    summary_file = SUMMARY_DIR / f"summary_{NUM_USERS}u_{timestamp}.json"
+    with open(summary_file, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary_file
+
+
+# ----------------------
+# 高併發執行
+# ----------------------
+def run_level(NUM_USERS, metrics=None, trial=None):
+    """
+    執行一次 NUM_USERS 人的高併發測試，寫出 log 與 summary，回傳 RunStats。
+    trial 為同一人數的第幾次執行（容量搜尋會重跑同一等級），加在檔名後避免一秒內跑完的 trial 互相覆蓋。
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if trial is not None:
+        timestamp = f"{timestamp}_t{trial}"
+    log_file = LOG_DIR / f"hc_{NUM_USERS}u_{timestamp}.log"
+
+    # 背景線程批次寫入 log，測試線程只做一次 queue.put；例外中斷時也會寫出已緩衝的 log 並結束背景線程
+    with LogPipeline(log_file, **LOG_PIPELINE) as logger:
+        logger.info("Start high concurrency test: %s users (engine: %s)", NUM_USERS, ENGINE)
+
+        stats = RunStats()
+        sink = open_sink(LOG_DIR / f"hc_{NUM_USERS}u_{timestamp}", RAW_LOG) if RAW_LOG else None
+
+        def on_result(res):
+            stats.add(res)
+            if sink is not None:
+                sink.write(res)
+            if metrics is not None:
+                metrics.record(res)
+            logger.sample("User %s finished, success: %s, total_time: %.3fs", res["user"], res["success"], res["total_time"])
+
+        if metrics is not None:
+            metrics.user_started(NUM_USERS)
+        if TRANSPORT == "wsgi":
+            # 先載入 app，import 時間不計入測試時間，也不會讓所有用戶線程卡在載入鎖上被誤判為熱點
+            get_wsgi_app()
+            wsgi_route_profile(reset=True)
+        profiler = ClientProfiler(**profiler_config(SELF_PROFILE, TRANSPORT)).start() if SELF_PROFILE is not None else None
+        t0 = time.monotonic()
+        try:
+            run_users(range(1, NUM_USERS + 1), NUM_USERS, on_result)
+        finally:
+            duration = time.monotonic() - t0
+            if profiler is not None:
+                profiler.stop()
+            if sink is not None:
+                sink.close()
 
         # ----------------------
         # 統計計算
         # ----------------------
-        total = len(results)
-        success_count = sum(1 for r in results if r["success"])
-        fail_count = total - success_count
-        avg_time = sum(r["total_time"] for r in results) / total if total else 0.0
-
-        # 步驟級別統計
-        step_stats = {}
-        for step_name in ["landing_page", "start_form", "submit_form"]:
-            step_times = [s["time"] for r in results for s in r["steps"] if s["step"] == step_name]
-            step_success = [s["success"] for r in results for s in r["steps"] if s["step"] == step_name]
-            step_stats[step_name] = {
-                "average_time": sum(step_times) / len(step_times) if step_times else 0.0,
-                "success_rate": sum(step_success) / len(step_success) if step_success else 0.0
-            }
-
-        summary = {
-            "NUM_USERS": NUM_USERS,
-            "total_users": total,
-            "success_count": success_count,
-            "fail_count": fail_count,
-            "success_rate": success_count / total if total else 0.0,
-            "average_time": avg_time,
-            "step_stats": step_stats
-        }
-
-        logger.info(f"SUMMARY: {summary}")
-
-        # 存放 summary JSON
-        summary_file = SUMMARY_DIR / f"summary_{NUM_USERS}u_{timestamp}.json"
-        with open(summary_file, "w", encoding="utf-8") as f:
-            json.dump(summary, f, indent=2)
-
-        print(f"----------------- High concurrency test for {NUM_USERS} users finished -----------------")
-        print(f"Log: {log_file}")
-        print(f"Summary: {summary_file}\n")
+        summary = build_summary(NUM_USERS, stats, duration)
+        if profiler is not None:
+            summary["client_profile"] = profiler.report()
+            summary["client_bottleneck"] = summary["client_profile"]["client_bottleneck"]
+        if TRANSPORT == "wsgi":
+            # 程序內執行時沒有網路成本，各路由的 CPU 即為應用程式本身的成本
+            summary["server_profile"] = wsgi_route_profile()
+
+        logger.info("SUMMARY: %s", summary)
+
+    # 存放 summary JSON
+    summary_file = write_summary(NUM_USERS, timestamp, summary)
+
+    print(f"----------------- High concurrency test for {NUM_USERS} users finished -----------------")
+    print(f"Log: {log_file}")
+    if sink is not None:
+        print(f"Raw results: {sink.path}")
+    if summary.get("client_bottleneck"):
+        print(f"WARNING: load generator was the bottleneck: {'; '.join(summary['client_profile']['reasons'])}")
+    print(f"Summary: {summary_file}\n")
+    return stats
+
+
+def run_capacity_search(metrics=None):
+    """以 capacity_search 設定自動搜尋符合 SLO 的最大併發人數"""
+    trials = Counter()
+
+    def run_trial(n):
+        trials[n] += 1
+        return run_level(n, metrics, trial=trials[n])
+
+    result = search_capacity(run_trial, **CAPACITY_SEARCH)
+
+    CAPACITY_DIR.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    capacity_file = CAPACITY_DIR / f"capacity_{timestamp}.json"
+    with open(capacity_file, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    lo, hi = result["bounds"]
+    print(f"----------------- Capacity search finished ({result['runs']} runs, {result['elapsed']:.0f}s) -----------------")
+    if hi is None:
+        print(f"Max sustainable users: >= {lo} (no SLO violation up to max_users)")
+    else:
+        print(f"Max sustainable users: {lo} (first violation at {hi})")
+    print(f"Capacity: {capacity_file}\n")
+    return result
+
+
+def run_high_concurrency():
+    metrics = LiveMetrics() if METRICS_PORT else None
+    metrics_server = start_metrics_server(metrics, METRICS_PORT) if metrics else None
+
+    if MODE == "capacity":
+        run_capacity_search(metrics)
+    else:
+        for NUM_USERS in NUM_USERS_LIST:
+            run_level(NUM_USERS, metrics)
+
+    if metrics_server is not None:
+        metrics_server.shutdown()
 
 
 if __name__ == "__main__":
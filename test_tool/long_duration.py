@@ -7,15 +7,15 @@ import math
 from pathlib import Path
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from core.api_test_core import visit_landing_page, start_form, submit_form
-
-# ----------------------
-# 假資料
-# ----------------------
-FAKE_DATA_PATH = Path("fake_data/fake_form_data.json")
-with open(FAKE_DATA_PATH, "r", encoding="utf-8") as f:
-    fake_data_list = json.load(f)
-data = fake_data_list[0]
+from core.api_test_core import visit_landing_page, start_form, submit_form, user_session, next_payload, CONNECTION_MODE, PAYLOAD_MODE, TRANSPORT, RETRY_POLICY, get_wsgi_app, wsgi_route_profile
+from core.async_engine import async_visit_landing_page, async_start_form, async_submit_form, run_async_users, run_async_schedule
+from core.arrival import arrival_offsets, run_thread_schedule, mark_start
+from core.stats import RunStats
+from core.result_sink import open_sink
+from core.log_pipeline import LogPipeline
+from core.live_metrics import LiveMetrics, start_metrics_server
+from core.self_profile import ClientProfiler, profiler_config
+from core.timeseries import TimeSeries, sidecar_path
 
 # ----------------------
 # 讀取長時間設定
@@ -30,6 +30,19 @@ UNIT_USERS = ld_config.get("unit_users", 10)
 PEAKS = ld_config.get("peaks", [2, 6])
 PEAK_SCALE = ld_config.get("peak_scale", 4.0)   # 高峰倍數
 NOISE = ld_config.get("noise", 0.008)
+LOG_FORMAT = ld_config.get("log_format", "jsonl")  # jsonl | binary
+METRICS_PORT = ld_config.get("metrics_port")  # None 不啟動即時指標端點
+SELF_PROFILE = ld_config.get("self_profile")  # None 不監測 | ClientProfiler 參數
+ENGINE = ld_config.get("engine", "thread")  # thread | async
+ASYNC_CONNECTION_LIMIT = ld_config.get("async_connection_limit", 0)  # 0 = 不限制
+# burst：每個 period 一次送出全部用戶並等待完成（原本行為）
+# constant / poisson / ramp：open model，依到達速率在時間軸上連續啟動用戶
+ARRIVAL_MODE = ld_config.get("arrival_mode", "burst")
+ARRIVAL_SEED = ld_config.get("arrival_seed")
+MAX_IN_FLIGHT = ld_config.get("max_in_flight", 1000)  # open model 線程版同時執行上限
+LOG_PIPELINE = ld_config.get("log", {})  # LogPipeline 參數：flush_interval
+# 每 resolution 秒的吞吐、錯誤率與延遲分位數；None 不記錄
+TIMESERIES = ld_config.get("timeseries", {"resolution": 1.0, "window": 120})
 
 # ----------------------
 # 設定log存放位置
@@ -41,6 +54,8 @@ SUMMARY_DIR.mkdir(parents=True, exist_ok=True)
 
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 summary_file = SUMMARY_DIR / f"summary_{timestamp}_total{TEST_TOTAL_TIME}_unit{TEST_UNIT_TIME}.json"
+# 所有用戶結果串流寫入（jsonl 或 binary），每筆帶有所屬 period
+log_path = LOG_DIR / f"longrun_{timestamp}"
 
 # ----------------------
 # 工具函式
@@ -66,29 +81,180 @@ def period_user(period_index: int, num_periods: int) -> int:
 # ----------------------
 # 單人流程封裝
 # ----------------------
-def user_test(index, total_users):
+def user_test(index, total_users, intended_start=None):
+    result = {"user": index, "steps": [], "success": True, "TEST_TOTAL_TIME": 0.0}
+    start_time = time.monotonic()
+    mark_start(result, start_time, intended_start)
+    data = next_payload()
+    try:
+        with user_session() as session:
+            # 將 current_users 放入表單傳給 submit_form
+            for step_name, func in [
+                ("landing_page", lambda: visit_landing_page(session)),
+                ("start_form", lambda: start_form(session)),
+                ("submit_form", lambda: submit_form({**data, "current_users": total_users}, session))
+            ]:
+                step_start_ns = time.time_ns()
+                r, elapsed, timing = func()
+                step_success = r.status_code == 200
+                result["steps"].append({"step": step_name, "success": step_success, "time": elapsed,
+                                        "status": r.status_code, "start_ns": step_start_ns, **timing})
+                if not step_success:
+                    result["success"] = False
+
+        result["TEST_TOTAL_TIME"] = time.monotonic() - start_time
+    except Exception as e:
+        result["success"] = False
+        result["error"] = str(e)
+        result["error_ns"] = time.time_ns()
+    return result
+
+
+async def async_user_test(session, index, total_users, intended_start=None):
     result = {"user": index, "steps": [], "success": True, "TEST_TOTAL_TIME": 0.0}
-    start_time = time.time()
+    start_time = time.monotonic()
+    mark_start(result, start_time, intended_start)
+    data = next_payload()
     try:
-        # 將 current_users 放入表單傳給 submit_form
-        for step_name, func in [
-            ("landing_page", visit_landing_page),
-            ("start_form", start_form),
-            ("submit_form", lambda: submit_form({**data, "current_users": total_users}))
+        for step_name, coro_func in [
+            ("landing_page", lambda: async_visit_landing_page(session)),
+            ("start_form", lambda: async_start_form(session)),
+            ("submit_form", lambda: async_submit_form(session, {**data, "current_users": total_users}))
         ]:
-            r, elapsed = func()
-            step_success = r.status_code == 200
-            result["steps"].append({"step": step_name, "success": step_success, "time": elapsed})
+            step_start_ns = time.time_ns()
+            r, elapsed, timing = await coro_func()
+            step_success = r.status == 200
+            result["steps"].append({"step": step_name, "success": step_success, "time": elapsed,
+                                    "status": r.status, "start_ns": step_start_ns, **timing})
             if not step_success:
                 result["success"] = False
 
-        result["TEST_TOTAL_TIME"] = time.time() - start_time
+        result["TEST_TOTAL_TIME"] = time.monotonic() - start_time
     except Exception as e:
         result["success"] = False
         result["error"] = str(e)
+        result["error_ns"] = time.time_ns()
     return result
 
 
+# ----------------------
+# 統計與 log
+# ----------------------
+def new_stats():
+    return RunStats(total_key="TEST_TOTAL_TIME")
+
+
+def add_lag_stats(stat, stats):
+    """open model：預定與實際開始時間的落差，以及以預定開始時間起算的校正回應時間"""
+    lag = stats.lag_stats()
+    if lag:
+        stat["avg_start_lag"] = lag["average"]
+        stat["max_start_lag"] = lag["percentiles"]["max"]
+        stat["start_lag_percentiles"] = lag["percentiles"]
+        stat["corrected_avg_time"] = stats.average_time + lag["average"]
+
+
+def period_stat(p, users, stats):
+    stat = {
+        "period": p,
+        "users": users,
+        "success_rate": stats.success_rate,
+        "avg_time": stats.average_time,
+        "percentiles": stats.percentiles(),
+        "step_stats": stats.step_stats(),
+        "load": stats.load_stats()
+    }
+    add_lag_stats(stat, stats)
+    return stat
+
+
+# ----------------------
+# 執行模式
+# ----------------------
+def run_burst_periods(num_periods, period_stats, total_stats, record, started, logger):
+    """每個 period 一次送出全部用戶，等待全部完成後才進入下一個 period"""
+    for p in range(num_periods):
+        users = period_user(p, num_periods)
+        stats = new_stats()
+
+        def on_result(res):
+            res["period"] = p
+            record(res)
+            stats.add(res)
+
+        started(users)
+
+        if ENGINE == "async":
+            run_async_users(
+                async_user_test,
+                [(i, users) for i in range(users)],
+                on_result=on_result,
+                connection_limit=ASYNC_CONNECTION_LIMIT
+            )
+        else:
+            with ThreadPoolExecutor() as executor:
+                futures = [executor.submit(user_test, i, users) for i in range(users)]
+                for future in as_completed(futures):
+                    on_result(future.result())
+
+        # 單位時間統計
+        stat = period_stat(p, users, stats)
+        period_stats.append(stat)
+
+        total_stats.merge(stats)
+        logger.info("[Period %d/%d] Users=%d, Success=%.2f, AvgTime=%.2fs",
+                    p + 1, num_periods, users, stat["success_rate"], stat["avg_time"])
+
+
+def run_open_model(num_periods, period_stats, total_stats, record, started, logger):
+    """
+    將 period_user 的人數曲線轉成連續到達速率，依牆鐘時間軸啟動用戶，
+    不論前面的用戶是否仍在執行中。
+    """
+    period_users = [period_user(p, num_periods) for p in range(num_periods)]
+    stats = [new_stats() for _ in range(num_periods)]
+    period_of = {}  # 執行中的用戶編號 -> 所屬 period，完成即移除
+
+    t0 = time.monotonic() + 0.1  # 預留排程啟動時間；與 mark_start 的實際開始時間同為 monotonic 時鐘
+
+    def schedule():
+        offsets = arrival_offsets(period_users, TEST_UNIT_TIME, ARRIVAL_MODE, ARRIVAL_SEED)
+        for i, (p, offset) in enumerate(offsets):
+            period_of[i] = p
+            yield t0 + offset, (i, period_users[p])
+
+    # 用戶真正開始執行時才計入 started（排程器會先等到預定時間，超過 max_in_flight 時還會排隊）
+    def start_user(*args, intended_start):
+        started(1)
+        return user_test(*args, intended_start=intended_start)
+
+    async def async_start_user(session, *args, intended_start):
+        started(1)
+        return await async_user_test(session, *args, intended_start=intended_start)
+
+    def on_result(res):
+        p = period_of.pop(res["user"])
+        res["period"] = p
+        record(res)
+        stats[p].add(res)
+
+    if ENGINE == "async":
+        run_async_schedule(async_start_user, schedule(), on_result=on_result,
+                           connection_limit=ASYNC_CONNECTION_LIMIT)
+    else:
+        run_thread_schedule(start_user, schedule(), on_result, max_workers=MAX_IN_FLIGHT)
+
+    for p in range(num_periods):
+        users = stats[p].total
+        stat = period_stat(p, users, stats[p])
+        stat["target_users"] = period_users[p]
+        period_stats.append(stat)
+        total_stats.merge(stats[p])
+        logger.info("[Period %d/%d] Users=%d, Success=%.2f, AvgTime=%.2fs, StartLag=%.1fms",
+                    p + 1, num_periods, users, stat["success_rate"], stat["avg_time"],
+                    stat.get("avg_start_lag", 0.0) * 1000)
+
+
 # ----------------------
 # 主流程
 # ----------------------
@@ -96,56 +262,91 @@ def run_long_duration():
     num_periods = TEST_TOTAL_TIME // TEST_UNIT_TIME
     if TEST_TOTAL_TIME % TEST_UNIT_TIME != 0:
         raise ValueError("TEST_TOTAL_TIME 必須能被 TEST_UNIT_TIME 整除")
+    if ENGINE == "async" and TRANSPORT == "wsgi":
+        raise ValueError("wsgi 傳輸只支援 thread 引擎")
 
-    all_results = []
+    total_stats = new_stats()
     period_stats = []
 
-    for p in range(num_periods):
-        users = period_user(p, num_periods)
-        period_results = []
+    metrics = LiveMetrics() if METRICS_PORT else None
+    # 逐秒欄位寫入 summary 旁的側檔，summary 只放概要
+    series = TimeSeries(sidecar_path(summary_file), **TIMESERIES) if TIMESERIES is not None else None
+    metrics_server = start_metrics_server(metrics, METRICS_PORT) if metrics else None
 
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(user_test, i, users) for i in range(users)]
-            for future in as_completed(futures):
-                period_results.append(future.result())
+    # period 進度經由背景線程輸出到 console 並寫入文字 log，不阻塞排程
+    with open_sink(log_path, LOG_FORMAT) as sink, \
+            LogPipeline(log_path.with_suffix(".log"), console=True, **LOG_PIPELINE) as logger:
+        # 每位用戶完成時：寫入結果檔、更新時間序列與即時指標
+        def record(res):
+            sink.write(res)
+            if series is not None:
+                series.add(res)
+            if metrics is not None:
+                metrics.record(res)
 
-        # 單位時間統計
-        successes = sum(1 for r in period_results if r["success"])
-        avg_time = sum(r["TEST_TOTAL_TIME"] for r in period_results) / len(period_results)
-        stat = {
-            "period": p,
-            "users": users,
-            "success_rate": successes / len(period_results),
-            "avg_time": avg_time
-        }
-        period_stats.append(stat)
+        def started(n):
+            if metrics is not None:
+                metrics.user_started(n)
 
-        # 寫入 log
-        log_file = LOG_DIR / f"longrun_{timestamp}_p{p}_users{users}.json"
-        with open(log_file, "w", encoding="utf-8") as f:
-            json.dump(period_results, f, indent=2, ensure_ascii=False)
+        if TRANSPORT == "wsgi":
+            get_wsgi_app()  # 先載入 app，import 時間不計入第一個 period
+            wsgi_route_profile(reset=True)
+        profiler = ClientProfiler(**profiler_config(SELF_PROFILE, TRANSPORT)).start() if SELF_PROFILE is not None else None
+        t0 = time.monotonic()
+        try:
+            if ARRIVAL_MODE == "burst":
+                run_burst_periods(num_periods, period_stats, total_stats, record, started, logger)
+            else:
+                run_open_model(num_periods, period_stats, total_stats, record, started, logger)
+        finally:
+            duration = time.monotonic() - t0
+            if profiler is not None:
+                profiler.stop()
 
-        all_results.extend(period_results)
-        print(f"[Period {p+1}/{num_periods}] Users={users}, Success={stat['success_rate']:.2f}, AvgTime={avg_time:.2f}s")
+    if metrics_server is not None:
+        metrics_server.shutdown()
 
     # ----------------------
     # 全域統計
     # ----------------------
-    total = len(all_results)
-    successes = sum(1 for r in all_results if r["success"])
-    avg_time = sum(r["TEST_TOTAL_TIME"] for r in all_results) / total
-
     summary = {
-        "total_users": total,
-        "success_rate": successes / total,
-        "avg_time": avg_time,
-        "period_stats": period_stats
+        "arrival_mode": ARRIVAL_MODE,
+        "total_users": total_stats.total,
+        "success_rate": total_stats.success_rate,
+        "avg_time": total_stats.average_time,
+        "percentiles": total_stats.percentiles(),
+        "step_stats": total_stats.step_stats(),
+        "load": total_stats.load_stats(duration),
+        "period_stats": period_stats,
+        "config": {
+            "engine": ENGINE,
+            "arrival_mode": ARRIVAL_MODE,
+            "test_total_time": TEST_TOTAL_TIME,
+            "test_unit_time": TEST_UNIT_TIME,
+            "unit_users": UNIT_USERS,
+            "connection_mode": CONNECTION_MODE,
+            "payload_mode": PAYLOAD_MODE,
+            "transport": TRANSPORT,
+            "retry_policy": RETRY_POLICY
+        }
     }
+    add_lag_stats(summary, total_stats)
+    if series is not None:
+        summary["timeseries"] = series.close()
+    if profiler is not None:
+        summary["client_profile"] = profiler.report()
+        summary["client_bottleneck"] = summary["client_profile"]["client_bottleneck"]
+    if TRANSPORT == "wsgi":
+        # 程序內執行時沒有網路成本，各路由的 CPU 即為應用程式本身的成本
+        summary["server_profile"] = wsgi_route_profile()
 
     with open(summary_file, "w", encoding="utf-8") as f:
         json.dump(summary, f, indent=2, ensure_ascii=False)
 
     print(f"----------------- Long duration test finished -----------------")
+    print(f"Log: {sink.path}")
+    if summary.get("client_bottleneck"):
+        print(f"WARNING: load generator was the bottleneck: {'; '.join(summary['client_profile']['reasons'])}")
     print(f"Summary: {summary_file}\n")
 
 
@@ -0,0 +1,143 @@
+# test_tool/replay.py
+import argparse
+import json
+import multiprocessing
+import queue
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from core.api_test_core import BASE_URL
+from core.histogram import LatencyHistogram
+from core.replay import replay_shard, trace_origin
+
+# ----------------------
+# 讀取重播設定
+# ----------------------
+REPLAY_CONFIG_PATH = Path("config/replay.json")
+with open(REPLAY_CONFIG_PATH, "r", encoding="utf-8") as f:
+    replay_config = json.load(f)
+
+TRACE_FILE = replay_config.get("trace_file")
+TARGET_URL = replay_config.get("base_url") or BASE_URL  # 預設沿用 core.json 的 BASE_URL
+SPEED = replay_config.get("speed", 1.0)  # 2.0 = 以兩倍速重播（間隔減半）
+PROCS = replay_config.get("procs", 1)  # 重播程序數，單一事件迴圈吃滿一顆 CPU 時增加
+CONNECTION_LIMIT = replay_config.get("connection_limit", 0)  # 每個程序的連線上限，0 = 不限制
+MAX_REQUESTS = replay_config.get("max_requests")  # None = 整份 trace
+
+SUMMARY_DIR = Path("results/summary/replay")
+
+
+# ----------------------
+# 多程序重播
+# ----------------------
+def _shard_process(shard, args, results):
+    results.put((shard, replay_shard(*args)))
+
+
+def _collect_shards(workers, results, poll=1.0):
+    """
+    依序收回各分片結果；每 poll 秒檢查一次程序是否已結束卻沒有送回結果，
+    有分片程序中途死掉（例外、被 OOM kill）時終止其餘程序並回報是哪個分片，而不是永遠等下去。
+    """
+    shards = {}
+    while len(shards) < len(workers):
+        # 子程序結束前會把結果寫進管道，等待前就已結束、等了 poll 秒仍讀不到結果的分片即為失敗
+        exited = [k for k, p in enumerate(workers) if p.exitcode is not None]
+        try:
+            k, shard = results.get(timeout=poll)
+            shards[k] = shard
+            continue
+        except queue.Empty:
+            pass
+        failed = [(k, workers[k].exitcode) for k in exited if k not in shards]
+        if failed:
+            for p in workers:
+                if p.exitcode is None:
+                    p.terminate()
+            raise RuntimeError("重播分片程序未回報結果即結束：" +
+                               ", ".join(f"shard {k} (exitcode {code})" for k, code in failed))
+    return [shards[k] for k in range(len(workers))]
+
+
+def run_replay(trace_file, base_url, speed, procs, connection_limit=0, max_requests=None):
+    """以 procs 個程序分片重播 trace，各程序對齊同一個起始時間，合併 drift 與延遲統計"""
+    origin = trace_origin(trace_file)
+    start_wall = time.time() + 0.5 + 0.2 * procs  # 預留程序啟動時間
+
+    if procs == 1:
+        shards = [replay_shard(trace_file, base_url, speed, start_wall, origin, 0, 1, connection_limit, max_requests)]
+    else:
+        ctx = multiprocessing.get_context("fork")
+        results = ctx.Queue()
+        workers = [ctx.Process(target=_shard_process,
+                               args=(k, (trace_file, base_url, speed, start_wall, origin, k, procs,
+                                         connection_limit, max_requests), results))
+                   for k in range(procs)]
+        for p in workers:
+            p.start()
+        try:
+            shards = _collect_shards(workers, results)
+        finally:
+            for p in workers:
+                p.join()
+
+    drift = LatencyHistogram()
+    latency = LatencyHistogram()
+    statuses = Counter()
+    for shard in shards:
+        drift.merge(LatencyHistogram.from_dict(shard["drift"]))
+        latency.merge(LatencyHistogram.from_dict(shard["latency"]))
+        statuses.update(shard["statuses"])
+
+    requests = sum(shard["requests"] for shard in shards)
+    late = sum(shard["late"] for shard in shards)
+    issue_span = max(s["last_offset"] for s in shards) - min(s["first_offset"] for s in shards)
+    trace_span = (max(s["last_ts"] for s in shards) - origin) / speed
+    return {
+        "trace_file": str(trace_file),
+        "base_url": base_url,
+        "speed": speed,
+        "procs": procs,
+        "requests": requests,
+        "errors": sum(shard["errors"] for shard in shards),
+        "statuses": dict(statuses),
+        "target_rps": requests / trace_span if trace_span > 0 else None,
+        "achieved_rps": requests / issue_span if issue_span > 0 else None,
+        "drift": {
+            "average": drift.mean,
+            **drift.percentiles(),
+            "late": late,
+            "late_ratio": late / requests if requests else 0.0
+        },
+        "latency": {"average": latency.mean, **latency.percentiles()}
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded request trace with its original timing")
+    parser.add_argument("--trace", default=TRACE_FILE, help="Trace file (JSONL) recorded with TRACE_RECORD")
+    parser.add_argument("--base_url", default=TARGET_URL)
+    parser.add_argument("--speed", type=float, default=SPEED, help="Speed multiplier, 2.0 halves inter-arrival gaps")
+    parser.add_argument("--procs", type=int, default=PROCS, help="Replay processes")
+    args = parser.parse_args()
+    if not args.trace:
+        parser.error("no trace file: set trace_file in config/replay.json or pass --trace")
+
+    summary = run_replay(args.trace, args.base_url, args.speed, args.procs, CONNECTION_LIMIT, MAX_REQUESTS)
+
+    SUMMARY_DIR.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary_file = SUMMARY_DIR / f"replay_{timestamp}.json"
+    with open(summary_file, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    drift = summary["drift"]
+    print(f"----------------- Replay finished: {summary['requests']} requests x{summary['speed']} -----------------")
+    if summary["target_rps"]:
+        print(f"Rate: target {summary['target_rps']:.1f} req/s, achieved {summary['achieved_rps'] or 0:.1f} req/s")
+    print(f"Drift: avg {drift['average'] * 1e6:.0f}us, p99 {drift['p99'] * 1e6:.0f}us, "
+          f"max {drift['max'] * 1e3:.2f}ms, late(>1ms) {drift['late_ratio']:.2%}")
+    print(f"Statuses: {summary['statuses']}, errors: {summary['errors']}")
+    print(f"Summary: {summary_file}\n")
@@ -0,0 +1,65 @@
+# utils/downsample.py
+import numpy as np
+
+
+# ----------------------
+# 保留形狀的降採樣
+# ----------------------
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets：將 (x, y) 降為 threshold 個點，
+    每個桶選出與前一個選中點、下一個桶平均點構成最大三角形的點，保留峰谷與轉折。
+    適合吞吐量、錯誤率這類連續曲線；y 不可含 NaN。
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    # 頭尾固定，中間 n - 2 個點切成 threshold - 2 個桶
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    picked = np.empty(threshold, dtype=int)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 下一個桶的平均點（最後一個桶改用終點）
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        picked[i + 1] = a
+    return x[picked], y[picked]
+
+
+def minmax(x, y, bins):
+    """
+    每個桶保留最小與最大值（依原本順序輸出兩點），尖峰不會被平均掉。
+    適合延遲分位數這類需要看見突波的曲線；NaN（無樣本）會被忽略，整桶皆 NaN 時輸出 NaN 斷線。
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if 2 * bins >= n or bins < 1:
+        return x, y
+
+    # 補齊長度後 reshape 成 (bins, width)，以向量運算找出每桶的極值位置
+    width = -(-n // bins)
+    bins = -(-n // width)
+    pad = bins * width - n
+    yy = np.concatenate([y, np.full(pad, np.nan)]).reshape(bins, width)
+    missing = np.isnan(yy)
+    empty = missing.all(axis=1)
+    lo = np.where(missing, np.inf, yy).argmin(axis=1)
+    hi = np.where(missing, -np.inf, yy).argmax(axis=1)
+
+    base = np.arange(bins) * width
+    first = np.minimum(lo, hi) + base
+    second = np.maximum(lo, hi) + base
+    idx = np.stack([first, second], axis=1).ravel()
+    idx = np.minimum(idx, n - 1)
+    out_y = y[idx]
+    out_y[np.repeat(empty, 2)] = np.nan
+    return x[idx], out_y
+
@@ -0,0 +1,80 @@
+# utils/fake_data_format.py
+import json
+import struct
+from itertools import product
+
+import numpy as np
+
+# ----------------------
+# 欄位定義
+# ----------------------
+GENDERS = ["male", "female", "other"]
+AGE_GROUPS = ["10以下", "10-20", "20-30", "30-40", "40-50", "50-60", "60-70", "70以上"]
+FEEDBACK_SAMPLES = ["非常滿意", "很好", "一般", "不錯", "需要改進"]
+WILLING_KEYS = ["to_return", "receive_promotions", "receive_birthday_notifications"]
+
+# 每個欄位的類別清單，順序即編碼（uint8）
+FIELDS = {
+    "gender": GENDERS,
+    "age_group": AGE_GROUPS,
+    "feedback": FEEDBACK_SAMPLES,
+    **{key: [True, False] for key in WILLING_KEYS}
+}
+
+# 二進位格式：MAGIC | uint32 header 長度 | header JSON | 每筆一列、每個欄位 1 byte 的編碼
+MAGIC = b"FKD1"
+_HEADER_LEN = struct.Struct("<I")
+
+
+def build_record(fields, codes):
+    """由各欄位的類別編碼組回表單資料"""
+    values = {name: categories[code] for (name, categories), code in zip(fields.items(), codes)}
+    return {
+        "gender": values["gender"],
+        "age_group": values["age_group"],
+        "feedback": values["feedback"],
+        "willing": {key: values[key] for key in WILLING_KEYS}
+    }
+
+
+# ----------------------
+# JSON Lines 編碼
+# ----------------------
+def record_table(fields=FIELDS):
+    """
+    預先編碼所有欄位組合的 JSON 行（本表單共 960 種），
+    之後每筆資料只需查表，不必逐筆 json.dumps。
+    """
+    dims = [len(categories) for categories in fields.values()]
+    return [
+        (json.dumps(build_record(fields, codes), ensure_ascii=False) + "\n").encode("utf-8")
+        for codes in product(*[range(d) for d in dims])
+    ]
+
+
+def combo_index(codes, fields=FIELDS):
+    """將 (n, 欄位數) 的編碼陣列轉成 record_table 的索引"""
+    dims = [len(categories) for categories in fields.values()]
+    return np.ravel_multi_index(codes.T, dims)
+
+
+# ----------------------
+# 二進位格式
+# ----------------------
+def write_binary_header(f, fields=FIELDS):
+    header = json.dumps({"fields": fields}, ensure_ascii=False).encode("utf-8")
+    f.write(MAGIC + _HEADER_LEN.pack(len(header)) + header)
+
+
+def read_binary_header(f):
+    """
+    讀取二進位假資料的 header。
+
+    Returns:
+        tuple: (fields, data_offset)，fields 為欄位 -> 類別清單，data_offset 為第一筆資料的位移。
+    """
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a binary fake data file")
+    (size,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+    fields = json.loads(f.read(size).decode("utf-8"))["fields"]
+    return fields, len(MAGIC) + _HEADER_LEN.size + size
@@ -1,12 +1,25 @@
+import argparse
 import os
 import json
 import random
+import time
+
+import numpy as np
+
+from utils.fake_data_format import (
+    AGE_GROUPS, FEEDBACK_SAMPLES, FIELDS, GENDERS,
+    combo_index, record_table, write_binary_header
+)
 
 # 載入設定檔
 with open("config/fake_data.json", "r", encoding="utf-8") as f:
     cfg = json.load(f)
 
 NUM_RECORDS = cfg["num_records"]
+FORMAT = cfg.get("format", "json")          # json | jsonl | binary
+SEED = cfg.get("seed")
+WEIGHTS = cfg.get("weights", {})
+CHUNK_SIZE = cfg.get("chunk_size", 100_000)
 
 def generate_fake_data(num_records=NUM_RECORDS, foldername="fake_data", filename="fake_form_data1.json"):
     """
@@ -17,16 +30,12 @@ def generate_fake_data(num_records=NUM_RECORDS, foldername="fake_data", filename
         foldername (str): 儲存資料夾名稱。
         filename (str): 輸出的 JSON 檔案名稱。
     """
-    genders = ["male", "female", "other"]
-    age_groups = ["10以下", "10-20", "20-30", "30-40", "40-50", "50-60", "60-70", "70以上"]
-    feedback_samples = ["非常滿意", "很好", "一般", "不錯", "需要改進"]
-
     data = []
     for _ in range(num_records):
         record = {
-            "gender": random.choice(genders),
-            "age_group": random.choice(age_groups),
-            "feedback": random.choice(feedback_samples),
+            "gender": random.choice(GENDERS),
+            "age_group": random.choice(AGE_GROUPS),
+            "feedback": random.choice(FEEDBACK_SAMPLES),
             "willing": {
                 "to_return": random.choice([True, False]),
                 "receive_promotions": random.choice([True, False]),
@@ -44,5 +53,91 @@ def generate_fake_data(num_records=NUM_RECORDS, foldername="fake_data", filename
 
     print(f"成功產生 {num_records} 筆資料，並儲存至 {file_path}")
 
+
+# ----------------------
+# 向量化串流產生
+# ----------------------
+def field_probabilities(weights):
+    """
+    將設定中的類別權重轉為機率，未設定的欄位為均勻分布。
+
+    Args:
+        weights (dict): 欄位 -> 與類別清單等長的權重，例如 {"gender": [5, 4, 1]}。
+    """
+    probs = {}
+    for name, categories in FIELDS.items():
+        w = weights.get(name)
+        if w is None:
+            probs[name] = None
+            continue
+        if len(w) != len(categories):
+            raise ValueError(f"weights for {name} need {len(categories)} values, got {len(w)}")
+        w = np.asarray(w, dtype=float)
+        probs[name] = w / w.sum()
+    return probs
+
+
+def draw_codes(rng, n, probs):
+    """一次抽出 n 筆資料所有欄位的類別編碼，回傳 (n, 欄位數) 的 uint8 陣列"""
+    codes = np.empty((n, len(FIELDS)), dtype=np.uint8)
+    for j, (name, categories) in enumerate(FIELDS.items()):
+        p = probs[name]
+        if p is None:
+            codes[:, j] = rng.integers(0, len(categories), size=n)
+        else:
+            codes[:, j] = rng.choice(len(categories), size=n, p=p)
+    return codes
+
+
+def stream_fake_data(num_records=NUM_RECORDS, foldername="fake_data", filename="fake_form_data",
+                     fmt="jsonl", seed=SEED, weights=WEIGHTS, chunk_size=CHUNK_SIZE):
+    """
+    以 NumPy 分批抽樣並串流寫出假資料，記憶體只與 chunk_size 有關。
+
+    Args:
+        num_records (int): 欲產生的資料筆數。
+        foldername (str): 儲存資料夾名稱。
+        filename (str): 輸出檔名（不含副檔名）。
+        fmt (str): jsonl 為每行一筆 JSON，binary 為每筆固定 6 bytes 的欄位編碼。
+        seed (int | None): 亂數種子，相同種子產生相同資料。
+        weights (dict): 各欄位的類別權重。
+        chunk_size (int): 每批產生的筆數。
+    """
+    rng = np.random.default_rng(seed)
+    probs = field_probabilities(weights or {})
+
+    os.makedirs(foldername, exist_ok=True)
+    file_path = os.path.join(foldername, filename + (".bin" if fmt == "binary" else ".jsonl"))
+
+    t0 = time.perf_counter()
+    with open(file_path, "wb") as f:
+        if fmt == "binary":
+            write_binary_header(f)
+        else:
+            table = record_table()
+
+        for start in range(0, num_records, chunk_size):
+            codes = draw_codes(rng, min(chunk_size, num_records - start), probs)
+            if fmt == "binary":
+                f.write(codes.tobytes())
+            else:
+                f.write(b"".join(map(table.__getitem__, combo_index(codes).tolist())))
+    elapsed = time.perf_counter() - t0
+
+    rate = num_records / elapsed if elapsed > 0 else float("inf")
+    print(f"成功產生 {num_records} 筆資料（{rate:,.0f} 筆/秒），並儲存至 {file_path}")
+    return file_path
+
+
 if __name__ == "__main__":
-    generate_fake_data()
+    parser = argparse.ArgumentParser(description="Generate fake form data")
+    parser.add_argument("--format", choices=["json", "jsonl", "binary"], default=FORMAT,
+                        help="json: single JSON list (original), jsonl/binary: vectorized streaming output")
+    parser.add_argument("--num_records", type=int, default=NUM_RECORDS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    if args.format == "json":
+        generate_fake_data(args.num_records)
+    else:
+        stream_fake_data(args.num_records, fmt=args.format, seed=args.seed)
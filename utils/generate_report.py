@@ -1,17 +1,45 @@
 # utils/generate_report.py
 import argparse
+import html
 import json
-import re
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
 from pathlib import Path
 
+import matplotlib
+matplotlib.use("Agg")  # 無視窗環境（CI）直接輸出圖檔
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.colors import LogNorm
+
+from core.histogram import LatencyHistogram
+from core.timeseries import read_timeseries, sidecar_path
+from utils.downsample import lttb, minmax
+from utils.run_index import RunIndex
+
+REPORT_DIR = Path("results/reports")
+PARALLEL_THRESHOLD = 4  # 圖表數達此數量才改用多程序繪製
+# 降採樣門檻：圖寬約 1200 px，超過這些點數已無法分辨，只增加繪製時間與記憶體
+MAX_POINTS = 2000  # 折線最多點數
+MAX_BARS = 300  # 超過時柱狀圖改畫成 min/max 包絡的階梯面積圖
+BAR_LABEL_LIMIT = 30  # 超過時不在柱頂標數值
+MARKER_LIMIT = 100  # 超過時折線不畫點
+HEATMAP_COLUMNS = 1000  # 熱圖時間軸最多欄數
 
 
 # -----------------------------
 # 柱狀圖函式
 # -----------------------------
 def plot_bar(ax, x, y, label="Users", color="tab:blue", alpha=0.8, show_value=True, value_offset=5):
-    """在指定的 ax 畫柱狀圖"""
+    """在指定的 ax 畫柱狀圖，點數超過 MAX_BARS 時改畫 min/max 降採樣後的階梯面積圖"""
+    if len(x) > MAX_BARS:
+        xs, ys = minmax(x, y, MAX_BARS)
+        area = ax.fill_between(xs, ys, step="mid", color=color, alpha=alpha, label=label)
+        ax.set_ylabel(label, color=color)
+        ax.tick_params(axis="y", labelcolor=color)
+        return area
+
     if max(y) > 0:
         # 使用漸層顏色
         bars = ax.bar(x, y, color=plt.cm.Blues([v/max(y) for v in y]), alpha=alpha)
@@ -22,7 +50,7 @@ def plot_bar(ax, x, y, label="Users", color="tab:blue", alpha=0.8, show_value=Tr
     ax.tick_params(axis="y", labelcolor=color)
 
     # 在柱頂加數值
-    if show_value:
+    if show_value and len(x) <= BAR_LABEL_LIMIT:
         for rect in ax.patches:
             height = rect.get_height()
             ax.text(rect.get_x() + rect.get_width()/2, height + value_offset, f"{height}",
@@ -34,7 +62,11 @@ def plot_bar(ax, x, y, label="Users", color="tab:blue", alpha=0.8, show_value=Tr
 # 折線圖函式
 # -----------------------------
 def plot_line(ax, x, y, label="Success Rate", color="tab:orange", marker="o", linewidth=3, alpha=0.8):
-    """在指定的 ax 畫折線圖"""
+    """在指定的 ax 畫折線圖，點數超過 MAX_POINTS 時以 LTTB 降採樣"""
+    if len(x) > MAX_POINTS:
+        x, y = lttb(x, y, MAX_POINTS)
+    if len(x) > MARKER_LIMIT:
+        marker = None
     line, = ax.plot(x, y, color=color, marker=marker, markersize=5, linewidth=linewidth, alpha=alpha, label=label)
     ax.set_ylabel(f"{label} (%)", color=color)
     ax.tick_params(axis="y", labelcolor=color)
@@ -42,33 +74,59 @@ def plot_line(ax, x, y, label="Success Rate", color="tab:orange", marker="o", li
 
 
 # -----------------------------
-# 高併發報表
+# 批次輸出
 # -----------------------------
-def generate_high_concurrency_report(summary_dir):
-    summary_dir = Path(summary_dir)
-    json_files = sorted(
-        summary_dir.glob("*.json"),
-        key=lambda f: int(re.search(r"_(\d+)u_", f.name).group(1))
+def render_charts(jobs, processes=None):
+    """
+    繪製多張圖表，jobs 為 (繪圖函式, 參數) 的清單，回傳各圖檔路徑。
+    圖表數量多時以多個程序平行繪製。
+    """
+    if len(jobs) < PARALLEL_THRESHOLD or processes == 1:
+        return [func(*args) for func, args in jobs]
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as executor:
+        futures = [executor.submit(func, *args) for func, args in jobs]
+        return [future.result() for future in futures]
+
+
+def write_html(title, charts, out_file):
+    """將圖表與對應的 run 資訊整理成一頁 HTML，圖片以相對路徑引用"""
+    sections = []
+    for caption, image in charts:
+        sections.append(
+            f"<section><h2>{html.escape(caption)}</h2>"
+            f'<img src="{html.escape(Path(image).name)}" alt="{html.escape(caption)}"></section>'
+        )
+    out_file.write_text(
+        f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+        "<style>body{font-family:sans-serif}img{max-width:100%}</style></head>\n"
+        f"<body><h1>{html.escape(title)}</h1>\n" + "\n".join(sections) + "\n</body></html>\n",
+        encoding="utf-8"
     )
+    return out_file
+
 
-    all_data = []
-    for f in json_files:
-        with open(f, "r", encoding="utf-8") as file:
-            data = json.load(file)
-            all_data.append(data)
+def drop_client_bottleneck(runs, label):
+    """排除 summary 標記為客戶端瓶頸（壓測程序本身吃滿）的 run，這些結果不代表伺服器容量"""
+    kept = [r for r in runs if not r["summary"].get("client_bottleneck")]
+    if len(kept) < len(runs):
+        print(f"[{label}] 已排除 {len(runs) - len(kept)} 筆客戶端瓶頸的 run（--include_client_bottleneck 可保留）")
+    return kept
 
-    print(f"[高併發報表] 已讀取 {len(all_data)} 筆 summary 檔案")
 
-    # 準備資料
-    batches = list(range(1, len(all_data) + 1))
-    num_users = [d["NUM_USERS"] for d in all_data]
-    success_rates = [d["success_rate"] * 100 for d in all_data]  # 百分比
+def describe(run):
+    config = ", ".join(f"{k}={v}" for k, v in run["config"].items())
+    return f"{run['run_id']} ({config})" if config else run["run_id"]
 
-    # 列印數值
-    # print("Batch | NUM_USERS | Success Rate (%)")
-    # print("-" * 30)
-    # for i, (n, s) in enumerate(zip(num_users, success_rates), 1):
-    #     print(f"{i:5d} | {n:9d} | {s:14.2f}")
+
+# -----------------------------
+# 高併發報表
+# -----------------------------
+def plot_high_concurrency(title, runs, out_file):
+    """一組高併發測試（依人數排序）畫成一張圖"""
+    runs = sorted(runs, key=lambda r: r["num_users"])
+    batches = list(range(1, len(runs) + 1))
+    num_users = [r["summary"]["NUM_USERS"] for r in runs]
+    success_rates = [r["summary"]["success_rate"] * 100 for r in runs]  # 百分比
 
     # -----------------------------
     # 畫圖
@@ -84,42 +142,76 @@ def generate_high_concurrency_report(summary_dir):
     ax1.set_xlabel("Batch")
     ax1.set_xticks(batches)
     ax1.set_xticklabels([str(b) for b in batches])
-    plt.title("High Concurrency Report")
+    plt.title(title)
 
     # 調整圖表區域與圖例
     fig.tight_layout(rect=[0, 0, 0.9, 1])
     fig.legend(loc="lower right", bbox_to_anchor=(1.0, 0), ncol=1, fontsize=9)
 
-    plt.show()
+    fig.savefig(out_file, dpi=100)
+    plt.close(fig)
+    return out_file
+
+
+def generate_high_concurrency_report(summary_dir, run=None, date=None, config=None,
+                                     out_dir=REPORT_DIR, processes=None, include_client_bottleneck=False):
+    """
+    從索引查詢高併發測試結果，同一天的各批次畫成一張圖，輸出 PNG 與 HTML。
+
+    Args:
+        summary_dir (str): summary 資料夾，查詢前會先增量更新索引。
+        run (str): 只畫指定的 run（檔名或時間戳記）。
+        date (str): 只畫指定日期（前綴）的 run。
+        config (dict): 只畫設定符合的 run，例如 {"engine": "async"}。
+        out_dir (Path): 圖檔與 HTML 的輸出資料夾。
+        processes (int): 平行繪圖的程序數，預設為 CPU 核心數。
+        include_client_bottleneck (bool): 是否保留標記為客戶端瓶頸的 run。
+    """
+    with RunIndex() as index:
+        added = index.refresh("high_concurrency", summary_dir)
+        runs = index.query("high_concurrency", run=run, date=date, config=config)
+
+    print(f"[高併發報表] 索引新增 / 更新 {added} 筆，符合條件 {len(runs)} 筆 summary")
+    if not include_client_bottleneck:
+        runs = drop_client_bottleneck(runs, "高併發報表")
+    if not runs:
+        return None
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    jobs, captions = [], []
+    for day, group in groupby(runs, key=lambda r: r["timestamp"][:8]):
+        group = list(group)
+        title = f"High Concurrency Report {day}"
+        jobs.append((plot_high_concurrency, (title, group, out_dir / f"high_concurrency_{day}.png")))
+        captions.append(f"{title}: " + ", ".join(r["run_id"] for r in group))
+        # 各批次合併所有步驟的直方圖畫成 CDF（直方圖不在索引中，由繪圖程序讀 summary 原檔）
+        sources = []
+        for r in sorted(group, key=lambda r: r["num_users"]):
+            label = f"{r['summary']['NUM_USERS']} users"
+            sources.append((f"{label} ({r['run_id']})" if any(label == l for l, _ in sources) else label, r["path"]))
+        jobs.append((plot_high_concurrency_cdf, (f"Latency CDF {day}", sources, out_dir / f"high_concurrency_{day}_cdf.png")))
+        captions.append(f"Latency CDF {day} (all steps)")
+
+    images = render_charts(jobs, processes)
+    # 沒有資料的圖（例如舊 summary 沒有直方圖）回傳 None，不列入報表
+    charts = [(caption, image) for caption, image in zip(captions, images) if image is not None]
+    report = write_html("High Concurrency Report", charts, out_dir / "high_concurrency.html")
+    print(f"Report: {report}")
+    return report
 
 
-def generate_long_duration_report(summary_dir):
-    summary_dir = Path(summary_dir)
-    json_files = sorted(summary_dir.glob("*.json"))
-    all_data = []
-
-    for f in json_files:
-        with open(f, "r", encoding="utf-8") as file:
-            data = json.load(file)
-            all_data.append(data)
-
-    if not all_data:
-        print("No JSON files found.")
-        return
-
-    # 只取第一個檔案的 period_stats
-    period_stats = all_data[0]["period_stats"]
+# -----------------------------
+# 長時間報表
+# -----------------------------
+def plot_long_duration(title, summary, out_file):
+    """單次長時間測試的各 period 人數與成功率"""
+    period_stats = summary["period_stats"]
 
     periods = [p["period"] for p in period_stats]
     users = [p["users"] for p in period_stats]
     success_rates = [p["success_rate"] * 100 for p in period_stats]  # 百分比
 
-    # # 列印數值
-    # print("Period | Users | Success Rate (%)")
-    # print("-" * 30)
-    # for per, u, s in zip(periods, users, success_rates):
-    #     print(f"{per:6d} | {u:5d} | {s:14.2f}")
-
     # -----------------------------
     # 從這邊開始畫圖
     fig, ax1 = plt.subplots(figsize=(10,6))
@@ -132,14 +224,209 @@ def generate_long_duration_report(summary_dir):
     line = plot_line(ax2, periods, success_rates, label="Success Rate", color="tab:orange")
 
     ax1.set_xlabel("Period")
-    plt.title("Long Duration Report")
+    plt.title(title)
 
     # 調整圖表區域，避免圖例擋線
     fig.tight_layout(rect=[0, 0, 0.9, 1])
     # 圖例合併，放右下
     fig.legend(loc="lower right", bbox_to_anchor=(1.0, 0), ncol=1, fontsize=9)
 
-    plt.show()
+    fig.savefig(out_file, dpi=100)
+    plt.close(fig)
+    return out_file
+
+
+def plot_long_duration_timeseries(title, series_file, unit_time, out_file):
+    """
+    時間序列側檔的逐秒曲線：各步驟吞吐、錯誤率與 p99，並以虛線標出 period 邊界，
+    period 平均看不出的短暫停頓會在這裡出現
+    """
+    series = read_timeseries(series_file, HEATMAP_COLUMNS)
+    resolution = series["resolution"]
+    x = np.arange(series["buckets"]) * resolution
+
+    # 吞吐與錯誤率以 LTTB 保留形狀，p99 以 min/max 保留尖峰；長時間（例如 24 小時逐秒）也只畫 MAX_POINTS 點
+    fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(12, 9), sharex=True)
+    for step, column in series["steps"].items():
+        count = np.asarray(column["count"], dtype=float)
+        errors = np.asarray(column["errors"], dtype=float)
+        ax1.plot(*lttb(x, count / resolution, MAX_POINTS), linewidth=1, label=step)
+        rate = np.divide(errors * 100, count, out=np.zeros_like(count), where=count > 0)
+        ax2.plot(*lttb(x, rate, MAX_POINTS), linewidth=1, label=step)
+        # 沒有樣本的 bucket 為 None（NaN），畫成斷線
+        p99 = np.array([v if v is not None else np.nan for v in column["p99"]], dtype=float) * 1000
+        ax3.plot(*minmax(x, p99, MAX_POINTS // 2), linewidth=1, label=step)
+    if any(series.get("exceptions", [])):
+        exceptions = np.asarray(series["exceptions"], dtype=float) / resolution
+        ax2.plot(*lttb(x, exceptions, MAX_POINTS), color="black", linewidth=1, linestyle=":", label="exceptions/s")
+
+    ax1.set_ylabel("Requests/s")
+    ax2.set_ylabel("Error Rate (%)")
+    ax3.set_ylabel("p99 (ms)")
+    ax3.set_xlabel("Time (s)")
+    for ax in (ax1, ax2, ax3):
+        # period 太多時邊界線只會塗滿整張圖，不畫
+        if unit_time and len(x) and len(x) * resolution / unit_time <= MARKER_LIMIT:
+            for boundary in range(unit_time, int(x[-1]) + 1, unit_time):
+                ax.axvline(boundary, color="gray", linestyle="--", linewidth=0.5)
+        ax.grid(True, alpha=0.3)
+    ax1.legend(loc="upper right", fontsize=8)
+    ax1.set_title(title)
+
+    fig.tight_layout()
+    fig.savefig(out_file, dpi=100)
+    plt.close(fig)
+    return out_file
+
+
+def plot_latency_heatmap(title, series_file, out_file):
+    """
+    由時間序列側檔的 latency_bins 畫各步驟的延遲熱圖（x 為時間、y 為對數延遲、顏色為請求數）。
+    讀取時相鄰 bucket 已相加到最多 HEATMAP_COLUMNS 欄，繪圖成本與請求數、測試時間無關。
+    """
+    series = read_timeseries(series_file, HEATMAP_COLUMNS)
+    resolution = series["resolution"]
+    per_octave = series["bins_per_octave"]
+    steps = series["steps"]
+    factor = series["heatmap_factor"]
+
+    fig, axes = plt.subplots(max(1, len(steps)), 1, figsize=(12, 3 * max(1, len(steps))), sharex=True, squeeze=False)
+    for ax, (step, column) in zip(axes[:, 0], steps.items()):
+        used = [b for cell in column["heatmap"] for b in cell]
+        if not used:
+            ax.set_title(step)
+            continue
+        lowest, highest = min(used), max(used)
+        grid = np.zeros((len(column["heatmap"]), highest - lowest + 1))
+        for i, cell in enumerate(column["heatmap"]):
+            for b, c in cell.items():
+                grid[i, b - lowest] = c
+
+        t_edges = np.arange(grid.shape[0] + 1) * factor * resolution
+        lat_edges = 2 ** (np.arange(lowest, highest + 2) / per_octave) / 1000  # ms
+        mesh = ax.pcolormesh(t_edges, lat_edges, np.ma.masked_equal(grid.T, 0), norm=LogNorm(), cmap="viridis")
+        ax.set_yscale("log")
+        ax.set_ylabel("Latency (ms)")
+        ax.set_title(step, fontsize=10)
+        fig.colorbar(mesh, ax=ax, label="Requests")
+    axes[-1, 0].set_xlabel("Time (s)")
+    fig.suptitle(title)
+
+    fig.tight_layout()
+    fig.savefig(out_file, dpi=100)
+    plt.close(fig)
+    return out_file
+
+
+def plot_latency_cdf(title, curves, out_file):
+    """
+    延遲 CDF，curves 為 {標籤: LatencyHistogram}，沒有任何樣本時不畫圖並回傳 None。
+    每個非零桶一點，請求數再多點數也只有數百個；y 軸以 1/(1-p) 對數刻度放大尾端。
+    """
+    curves = {label: h for label, h in curves.items() if h.total_count}
+    if not curves:
+        return None
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for label, histogram in curves.items():
+        values, fractions = zip(*histogram.cdf())
+        fractions = np.minimum(np.asarray(fractions), 1 - 1 / (10 * histogram.total_count))
+        ax.step(np.asarray(values) * 1000, 1 / (1 - fractions), where="post", linewidth=1.5, label=label)
+
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    ticks = [50, 90, 99, 99.9, 99.99]
+    ax.set_yticks([1 / (1 - p / 100) for p in ticks])
+    ax.set_yticklabels([f"p{p:g}" for p in ticks])
+    ax.set_xlabel("Latency (ms)")
+    ax.set_ylabel("Percentile")
+    ax.grid(True, which="both", alpha=0.3)
+    ax.legend(fontsize=8)
+    ax.set_title(title)
+
+    fig.tight_layout()
+    fig.savefig(out_file, dpi=100)
+    plt.close(fig)
+    return out_file
+
+
+def load_step_histograms(summary_path):
+    """讀 summary 原檔中各步驟的直方圖（舊的 summary 沒有時回傳空 dict）"""
+    with open(summary_path, "r", encoding="utf-8") as f:
+        step_stats = json.load(f).get("step_stats", {})
+    return {step: LatencyHistogram.from_dict(stats["histogram"]) for step, stats in step_stats.items()
+            if "histogram" in stats}
+
+
+def plot_long_duration_cdf(title, summary_path, out_file):
+    """單次長時間測試各步驟的延遲 CDF"""
+    return plot_latency_cdf(title, load_step_histograms(summary_path), out_file)
+
+
+def plot_high_concurrency_cdf(title, sources, out_file):
+    """sources 為 [(標籤, summary 路徑), ...]，每個 run 合併所有步驟畫一條 CDF"""
+    curves = {}
+    for label, path in sources:
+        merged = None
+        for histogram in load_step_histograms(path).values():
+            merged = histogram if merged is None else merged.merge(histogram)
+        if merged is not None:
+            curves[label] = merged
+    return plot_latency_cdf(title, curves, out_file)
+
+
+def generate_long_duration_report(summary_dir, run=None, date=None, config=None,
+                                  out_dir=REPORT_DIR, processes=None, include_client_bottleneck=False):
+    """
+    從索引查詢長時間測試結果，每次測試畫一張 period 圖，
+    有時間序列側檔時再加逐秒曲線與延遲熱圖、有步驟直方圖時再加 CDF，輸出 PNG 與 HTML。
+    參數同 generate_high_concurrency_report。
+    """
+    with RunIndex() as index:
+        added = index.refresh("long_duration", summary_dir)
+        runs = index.query("long_duration", run=run, date=date, config=config)
+
+    print(f"[長時間報表] 索引新增 / 更新 {added} 筆，符合條件 {len(runs)} 筆 summary")
+    if not include_client_bottleneck:
+        runs = drop_client_bottleneck(runs, "長時間報表")
+    if not runs:
+        print("No JSON files found.")
+        return None
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    jobs, captions = [], []
+    for r in runs:
+        jobs.append((plot_long_duration, (f"Long Duration Report {r['timestamp']}", r["summary"],
+                                          out_dir / f"long_duration_{r['run_id']}.png")))
+        captions.append(describe(r))
+        # 逐秒資料在 summary 旁的側檔，由繪圖程序各自串流讀取
+        series_file = sidecar_path(r["path"])
+        if series_file.exists():
+            jobs.append((plot_long_duration_timeseries, (f"Per-second {r['timestamp']}", series_file,
+                                                         r["config"].get("test_unit_time"),
+                                                         out_dir / f"long_duration_{r['run_id']}_timeseries.png")))
+            captions.append(f"{describe(r)} - time series")
+            jobs.append((plot_latency_heatmap, (f"Latency Heatmap {r['timestamp']}", series_file,
+                                                out_dir / f"long_duration_{r['run_id']}_heatmap.png")))
+            captions.append(f"{describe(r)} - latency heatmap")
+        jobs.append((plot_long_duration_cdf, (f"Latency CDF {r['timestamp']}", r["path"],
+                                              out_dir / f"long_duration_{r['run_id']}_cdf.png")))
+        captions.append(f"{describe(r)} - latency CDF")
+    images = render_charts(jobs, processes)
+    charts = [(caption, image) for caption, image in zip(captions, images) if image is not None]
+    report = write_html("Long Duration Report", charts, out_dir / "long_duration.html")
+    print(f"Report: {report}")
+    return report
+
+
+def parse_config(items):
+    """--config key=value 轉成 dict"""
+    config = {}
+    for item in items or []:
+        key, _, value = item.partition("=")
+        config[key] = value
+    return config
 
 
 if __name__ == "__main__":
@@ -148,11 +435,22 @@ if __name__ == "__main__":
                         help="Generate high concurrency test report")
     parser.add_argument("--long_duration", action="store_true",
                         help="Generate long duration test report")
+    parser.add_argument("--run", help="Only this run (summary file stem or YYYYMMDD_HHMMSS timestamp)")
+    parser.add_argument("--date", help="Only runs on this date prefix, e.g. 2025-01-31 or 202501")
+    parser.add_argument("--config", action="append", metavar="KEY=VALUE",
+                        help="Only runs whose config matches, e.g. --config engine=async (repeatable)")
+    parser.add_argument("--out", default=str(REPORT_DIR), help="Output directory for PNG/HTML")
+    parser.add_argument("--processes", type=int, help="Worker processes for rendering (default: CPU count)")
+    parser.add_argument("--include_client_bottleneck", action="store_true",
+                        help="Keep runs flagged as limited by the load generator itself")
     args = parser.parse_args()
 
+    filters = dict(run=args.run, date=args.date, config=parse_config(args.config),
+                   out_dir=args.out, processes=args.processes,
+                   include_client_bottleneck=args.include_client_bottleneck)
     if args.high_concurrency:
-        generate_high_concurrency_report("results/summary/high_concurrency")
+        generate_high_concurrency_report("results/summary/high_concurrency", **filters)
     elif args.long_duration:
-        generate_long_duration_report("results/summary/long_duration")
+        generate_long_duration_report("results/summary/long_duration", **filters)
     else:
         print("請指定 --high_concurrency 或 --long_duration")
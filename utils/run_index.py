@@ -0,0 +1,195 @@
+# utils/run_index.py
+import json
+import re
+import sqlite3
+from pathlib import Path
+
+INDEX_PATH = Path("results/run_index.sqlite")
+RESULT_DIRS = {
+    "high_concurrency": (Path("results/summary/high_concurrency"), Path("results/logs/high_concurrency")),
+    "long_duration": (Path("results/summary/long_duration"), Path("results/logs/long_duration")),
+}
+
+_TIMESTAMP = re.compile(r"(\d{8}_\d{6})")
+_NUM_USERS = re.compile(r"_(\d+)u_")
+_LONG_CONFIG = re.compile(r"_total(\d+(?:\.\d+)?)_unit(\d+(?:\.\d+)?)")
+# 索引格式版本，舊版索引存有完整 summary（含直方圖、時間序列），升版時清空重建
+_INDEX_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    timestamp TEXT,
+    num_users INTEGER,
+    success_rate REAL,
+    config TEXT,
+    summary TEXT,
+    mtime REAL,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_kind_ts ON runs (kind, timestamp);
+CREATE TABLE IF NOT EXISTS logs (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    timestamp TEXT,
+    size INTEGER,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS logs_kind_ts ON logs (kind, timestamp);
+"""
+
+
+# ----------------------
+# 測試結果索引
+# ----------------------
+class RunIndex:
+    """
+    以 SQLite 記錄 results/ 底下的 summary 與 log 檔。
+
+    refresh() 只比對檔案的 mtime / 大小，新增或變動的 summary 才重新解析，
+    報表改從索引查詢，不必每次重新 glob 並解析全部檔案。
+    索引只存 summary 的純量與小型欄位，各步驟直方圖與時間序列概要不進索引，需要時讀原檔（path）。
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < _INDEX_VERSION:
+            self.conn.execute("DELETE FROM runs")
+            self.conn.execute(f"PRAGMA user_version = {_INDEX_VERSION}")
+            self.conn.commit()
+
+    def refresh(self, kind, summary_dir=None, log_dir=None):
+        """
+        掃描指定類型的 summary / log 資料夾並更新索引。
+
+        Returns:
+            int: 新增或更新的 summary 數量。
+        """
+        default_summary, default_log = RESULT_DIRS[kind]
+        summary_dir = Path(summary_dir or default_summary)
+        log_dir = Path(log_dir or default_log)
+
+        known = {row[0]: (row[1], row[2]) for row in
+                 self.conn.execute("SELECT path, mtime, size FROM runs WHERE kind = ?", (kind,))}
+        changed = 0
+        seen = set()
+        for f in summary_dir.glob("*.json"):
+            st = f.stat()
+            path = str(f)
+            seen.add(path)
+            if known.get(path) == (st.st_mtime, st.st_size):
+                continue
+            with open(f, "r", encoding="utf-8") as file:
+                summary = json.load(file)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, kind, f.stem, _timestamp(f.name), _num_users(f.name, summary),
+                 summary.get("success_rate"), json.dumps(_run_config(kind, f.name, summary)),
+                 json.dumps(_indexed_summary(summary), ensure_ascii=False), st.st_mtime, st.st_size)
+            )
+            changed += 1
+        # 已刪除的 summary 一併移出索引
+        for path in set(known) - seen:
+            self.conn.execute("DELETE FROM runs WHERE path = ?", (path,))
+
+        known_logs = {row[0]: (row[1], row[2]) for row in
+                      self.conn.execute("SELECT path, mtime, size FROM logs WHERE kind = ?", (kind,))}
+        seen = set()
+        for f in log_dir.glob("*") if log_dir.exists() else []:
+            st = f.stat()
+            path = str(f)
+            seen.add(path)
+            if known_logs.get(path) != (st.st_mtime, st.st_size):
+                self.conn.execute("INSERT OR REPLACE INTO logs VALUES (?, ?, ?, ?, ?)",
+                                  (path, kind, _timestamp(f.name), st.st_size, st.st_mtime))
+        for path in set(known_logs) - seen:
+            self.conn.execute("DELETE FROM logs WHERE path = ?", (path,))
+
+        self.conn.commit()
+        return changed
+
+    def query(self, kind, run=None, date=None, config=None):
+        """
+        查詢測試結果。
+
+        Args:
+            kind (str): high_concurrency 或 long_duration。
+            run (str): summary 檔名（不含副檔名）或時間戳記 YYYYMMDD_HHMMSS。
+            date (str): 日期前綴，例如 2025-01-31、20250131 或 202501。
+            config (dict): 測試設定須符合的值，例如 {"engine": "async"}。
+
+        Returns:
+            list: 每筆為 {"run_id", "path", "timestamp", "num_users", "config", "summary", "logs"}，依時間排序。
+        """
+        sql = "SELECT path, run_id, timestamp, num_users, config, summary FROM runs WHERE kind = ?"
+        params = [kind]
+        if run:
+            sql += " AND (run_id = ? OR timestamp = ?)"
+            params += [run, run]
+        if date:
+            sql += " AND timestamp LIKE ?"
+            params.append(date.replace("-", "") + "%")
+        sql += " ORDER BY timestamp, num_users"
+
+        runs = []
+        for path, run_id, timestamp, num_users, run_config, summary in self.conn.execute(sql, params):
+            run_config = json.loads(run_config)
+            if config and any(str(run_config.get(k)) != str(v) for k, v in config.items()):
+                continue
+            runs.append({
+                "run_id": run_id,
+                "path": path,
+                "timestamp": timestamp,
+                "num_users": num_users,
+                "config": run_config,
+                "summary": json.loads(summary),
+                "logs": [row[0] for row in self.conn.execute(
+                    "SELECT path FROM logs WHERE kind = ? AND timestamp = ? ORDER BY path", (kind, timestamp))]
+            })
+        return runs
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _indexed_summary(summary):
+    """去掉隨資料量成長的欄位：時間序列與各步驟的完整直方圖"""
+    summary = {k: v for k, v in summary.items() if k != "timeseries"}
+    if "step_stats" in summary:
+        summary["step_stats"] = {step: {k: v for k, v in stats.items() if k != "histogram"}
+                                 for step, stats in summary["step_stats"].items()}
+    return summary
+
+
+def _timestamp(name):
+    m = _TIMESTAMP.search(name)
+    return m.group(1) if m else None
+
+
+def _num_users(name, summary):
+    m = _NUM_USERS.search(name)
+    if m:
+        return int(m.group(1))
+    return summary.get("NUM_USERS", summary.get("total_users"))
+
+
+def _run_config(kind, name, summary):
+    """summary 內記錄的測試設定；舊版 summary 沒有 config 時從檔名與欄位推回"""
+    config = dict(summary.get("config", {}))
+    if kind == "long_duration":
+        m = _LONG_CONFIG.search(name)
+        if m:
+            config.setdefault("test_total_time", json.loads(m.group(1)))
+            config.setdefault("test_unit_time", json.loads(m.group(2)))
+        config.setdefault("arrival_mode", summary.get("arrival_mode", "burst"))
+    return config
@@ -0,0 +1,58 @@
+# utils/summarize_raw.py
+import argparse
+import json
+
+import numpy as np
+
+from core.result_store import ERROR_STEP, ResultStore
+
+
+# ----------------------
+# 二進位原始結果彙總
+# ----------------------
+def summarize_raw(path, by_period=False):
+    """
+    讀回 binary 格式的原始結果（raw_log / log_format 為 binary 時的 .bin 檔），
+    以 ResultStore.aggregate() 對整欄做向量化彙總，不需要先轉回逐筆 dict。
+
+    Args:
+        path (str): .bin 結果檔路徑。
+        by_period (bool): 另外依 period 分組彙總（長時間測試的結果檔）。
+
+    Returns:
+        dict: rows、users、user_errors、statuses、step_stats，by_period 時另有 periods。
+    """
+    store = ResultStore.load(path)
+    cols = store.columns()
+    # 長時間測試的用戶編號在每個 period 重新計算，以 (period, user) 區分
+    users = np.unique(np.stack([cols["period"].astype(np.int64), cols["user"]]), axis=1).shape[1] if len(store) else 0
+    steps = cols["step"] != ERROR_STEP
+    codes, counts = np.unique(cols["status"][steps], return_counts=True)
+
+    summary = {
+        "file": str(path),
+        "rows": len(store),
+        "users": users,
+        "user_errors": int((~steps).sum()),
+        "statuses": {str(code): int(n) for code, n in zip(codes, counts)},
+        "step_stats": store.aggregate()
+    }
+    if by_period:
+        summary["periods"] = {int(p): store.aggregate(period=p) for p in np.unique(cols["period"])}
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a binary raw result log")
+    parser.add_argument("path", help="Binary result file (.bin)")
+    parser.add_argument("--by_period", action="store_true", help="Also summarize each period separately")
+    parser.add_argument("--out", help="Write the summary JSON here instead of stdout")
+    args = parser.parse_args()
+
+    summary = summarize_raw(args.path, args.by_period)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        print(f"Summary: {args.out}")
+    else:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
@@ -0,0 +1,20 @@
+# utils/system.py
+
+# ----------------------
+# 系統資源設定
+# ----------------------
+def raise_fd_limit():
+    """
+    上萬個連線需要足夠的檔案描述符，將 soft limit 盡量提高到 hard limit
+    """
+    try:
+        import resource
+    except ImportError:  # Windows 沒有 resource 模組
+        return
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass